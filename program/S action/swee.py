@@ -17,6 +17,13 @@ gesture_key_mapping = {}
 is_running = False  # Flag to indicate if gesture detection is running
 sequence_length = 30  # Number of frames per action sequence
 
+# Template matching runs on a downscaled copy of the frame, inside the region where the hand
+# moved while the gesture was registered
+pyramid_levels = 3  # Each level halves the resolution, 3 levels = 1/8
+search_padding = 4  # Pixels (at the downscaled size) the hand may move away from its registered place
+match_threshold = 0.7  # Adjusted threshold for detection accuracy
+template_cache = {}  # gesture_id -> (downscaled template patch, (x, y, w, h) region), loaded once
+
 # Add these variables for gesture detection management
 last_detected_gesture = None
 gesture_cooldown = 500  # milliseconds
@@ -60,7 +67,7 @@ def update_frame():
             canvas.create_image(0, 0, anchor=tk.NW, image=img_tk)
             canvas.img_tk = img_tk  # Keep a reference to avoid garbage collection
         
-        if is_running:
+        if is_running and ret:
             # Detect gesture from the current frame
             gesture_id = detect_gesture(frame)
             if gesture_id is not None:
@@ -68,30 +75,69 @@ def update_frame():
 
     root.after(10, update_frame)
 
+# Halve the image pyramid_levels times
+def downscale(gray):
+    for _ in range(pyramid_levels):
+        gray = cv2.pyrDown(gray)
+    return gray
+
+# Bounding box (x, y, w, h) at the downscaled size of the pixels that changed while a gesture
+# was recorded, which is where the hand was; None if nothing moved
+def motion_region(frames):
+    small = [downscale(cv2.cvtColor(f, cv2.COLOR_BGR2GRAY)).astype(np.int16) for f in frames[::5]]
+    if len(small) < 2:
+        return None
+    motion = np.max([np.abs(a - b) for a, b in zip(small[1:], small[:-1])], axis=0)
+    ys, xs = np.nonzero(motion > 25)
+    if len(xs) == 0 or xs.max() - xs.min() < 4 or ys.max() - ys.min() < 4:
+        return None
+    return [int(xs.min()), int(ys.min()), int(xs.max() - xs.min() + 1), int(ys.max() - ys.min() + 1)]
+
+# Decode, resize and downscale a gesture image once, and keep only its hand region
+def get_template(gesture_id, frame_shape):
+    if gesture_id in template_cache:
+        return template_cache[gesture_id]
+    gesture_path = os.path.join(gesture_dir, f"gesture_{gesture_id}.png")
+    if not os.path.exists(gesture_path):
+        return None
+    saved_gesture_img = cv2.imread(gesture_path, 0)  # Load the gesture image in grayscale
+    saved_gesture_img = cv2.resize(saved_gesture_img, (frame_shape[1], frame_shape[0]))  # Resize gesture to match frame size
+    small = downscale(saved_gesture_img)
+
+    region = None
+    region_path = os.path.join(gesture_dir, f"gesture_{gesture_id}_region.json")
+    if os.path.exists(region_path):
+        with open(region_path, "r") as f:
+            region = json.load(f)
+    if region is None:
+        region = [0, 0, small.shape[1], small.shape[0]]  # No hand region recorded, use the whole frame
+    x, y, w, h = region
+    template_cache[gesture_id] = (small[y:y + h, x:x + w].copy(), region)
+    return template_cache[gesture_id]
+
 # Function to detect gestures (template matching example)
 def detect_gesture(frame):
-    global last_detected_gesture
     gray_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)  # Convert the frame to grayscale for comparison
-    detected_gesture_id = None  # Track which gesture was detected
+    small_frame = downscale(gray_frame)
+    frame_h, frame_w = small_frame.shape
 
     for gesture_id in gesture_key_mapping:
-        gesture_path = os.path.join(gesture_dir, f"gesture_{gesture_id}.png")
-        
-        # Ensure the gesture image exists before attempting to load it
-        if os.path.exists(gesture_path):
-            saved_gesture_img = cv2.imread(gesture_path, 0)  # Load the gesture image in grayscale
-            saved_gesture_img = cv2.resize(saved_gesture_img, (gray_frame.shape[1], gray_frame.shape[0]))  # Resize gesture to match frame size
-            
-            # Template matching (use normalized cross-correlation method)
-            result = cv2.matchTemplate(gray_frame, saved_gesture_img, cv2.TM_CCOEFF_NORMED)
-            threshold = 0.7  # Adjusted threshold for detection accuracy
-            loc = np.where(result >= threshold)
-            
-            if len(loc[0]) > 0:
-                detected_gesture_id = gesture_id
-                break  # Exit the loop as we found a matching gesture
-
-    return detected_gesture_id
+        template = get_template(gesture_id, gray_frame.shape)
+        if template is None:
+            continue
+        patch, (x, y, w, h) = template
+
+        # Search only around the place the hand was registered
+        x0, y0 = max(x - search_padding, 0), max(y - search_padding, 0)
+        x1, y1 = min(x + w + search_padding, frame_w), min(y + h + search_padding, frame_h)
+
+        # Template matching (use normalized cross-correlation method), only the best score matters
+        result = cv2.matchTemplate(small_frame[y0:y1, x0:x1], patch, cv2.TM_CCOEFF_NORMED)
+        _, max_value, _, _ = cv2.minMaxLoc(result)
+        if max_value >= match_threshold:
+            return gesture_id  # Exit the loop as we found a matching gesture
+
+    return None
 
 # Function to register a new gesture and assign a key
 def register_gesture():
@@ -113,6 +159,11 @@ def register_gesture():
     # Save frames as a sequence for the gesture
     file_path = os.path.join(gesture_dir, f"gesture_{current_gesture_index}.png")
     cv2.imwrite(file_path, frames[-1])  # Save the last frame as the gesture image
+    region = motion_region(frames)
+    if region is not None:
+        with open(os.path.join(gesture_dir, f"gesture_{current_gesture_index}_region.json"), "w") as f:
+            json.dump(region, f)
+    template_cache.pop(current_gesture_index, None)
 
     # Ask the user to input the keyboard key for this gesture
     key = simpledialog.askstring("Assign Key", f"Enter a key for Gesture {current_gesture_index + 1}:")
@@ -141,6 +192,7 @@ def reset_app():
     
     current_gesture_index = 0
     gesture_key_mapping = {}
+    template_cache.clear()
     is_gesture_registered = False
     status_label.config(text="All gestures have been reset.")
     canvas.delete("all")  # Clear the canvas
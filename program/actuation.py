@@ -0,0 +1,115 @@
+import threading
+import time
+from collections import deque, namedtuple
+
+# One action a mode decided on in a frame: what produced it (e.g. "gesture", "motion" or "steering"), the
+# call with its arguments, the hand track it came from (None for the whole frame), the gesture or direction,
+# and whether it only repeats the action of that hand in the previous frame because the gesture is held
+ModeAction = namedtuple("ModeAction", "source name args hand gesture repeat")
+
+
+# Runs pyautogui calls on a worker thread so their built-in pause never blocks the vision loop.
+# Actions wait in a bounded queue; a cursor move replaces a move that is still waiting, and an
+# action identical to the last waiting one is merged into it, so a held gesture cannot build a backlog.
+class ActuationWorker:
+    def __init__(self, maxsize=16, target=None, on_executed=None):
+        self.maxsize = maxsize
+        self.target = target  # Object whose methods are called, pyautogui when None
+        self.on_executed = on_executed  # Called with the origin given to submit() after each call
+        self.executed = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.failed = 0  # Calls that raised, e.g. pyautogui's fail-safe in a screen corner
+        self.last_error = None
+        self.max_depth = 0
+        self.last_lag = 0.0  # Seconds from submit() until the call finished
+        self.max_lag = 0.0
+        self._total_lag = 0.0
+        self._queue = deque()
+        self._condition = threading.Condition()
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        if self.target is None:
+            import pyautogui
+            self.target = pyautogui
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    # Queue a call such as submit("moveTo", x, y); never blocks. origin is passed on to on_executed,
+    # e.g. the capture time of the frame that caused the call.
+    def submit(self, name, *args, origin=None):
+        with self._condition:
+            if self._queue:
+                last = self._queue[-1]
+                if last[0] == name and (name == "moveTo" or last[1] == args):
+                    # Move to the newest target, or merge a repeated action, keeping the older submit time
+                    self._queue[-1] = (name, args, last[2], origin if origin is not None else last[3])
+                    self.coalesced += 1
+                    return True
+            if len(self._queue) >= self.maxsize:
+                self.dropped += 1
+                return False
+            self._queue.append((name, args, time.perf_counter(), origin))
+            self.max_depth = max(self.max_depth, len(self._queue))
+            self._condition.notify()
+        return True
+
+    def _run(self):
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._queue or not self._running)
+                if not self._queue:
+                    return
+                name, args, submitted, origin = self._queue.popleft()
+
+            try:
+                getattr(self.target, name)(*args)
+            except Exception as e:
+                # One failed call must not end the worker; report each new error once
+                error = f"{name}{args}: {type(e).__name__}: {e}"
+                with self._condition:
+                    self.failed += 1
+                    repeated, self.last_error = error == self.last_error, error
+                if not repeated:
+                    print(f"Action failed, {error}")
+                continue
+            if self.on_executed is not None and origin is not None:
+                self.on_executed(origin)
+
+            lag = time.perf_counter() - submitted
+            with self._condition:
+                self.executed += 1
+                self.last_lag = lag
+                self.max_lag = max(self.max_lag, lag)
+                self._total_lag += lag
+
+    def queue_depth(self):
+        with self._condition:
+            return len(self._queue)
+
+    def stats(self):
+        with self._condition:
+            return {
+                "queue_depth": len(self._queue),
+                "max_depth": self.max_depth,
+                "executed": self.executed,
+                "coalesced": self.coalesced,
+                "dropped": self.dropped,
+                "failed": self.failed,
+                "last_error": self.last_error,
+                "last_lag_ms": self.last_lag * 1000,
+                "mean_lag_ms": self._total_lag / self.executed * 1000 if self.executed else 0.0,
+                "max_lag_ms": self.max_lag * 1000,
+            }
+
+    # Finish the queued actions and stop the worker
+    def stop(self):
+        with self._condition:
+            self._running = False
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join()
@@ -1,52 +1,150 @@
 import os
+import sys
+import time
+import queue
+import argparse
+import threading
 import cv2
+import numpy as np
+import mediapipe as mp
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from framesource import open_source
 
 DATA_DIR = '.data'
-if not os.path.exists(DATA_DIR):
-    os.makedirs(DATA_DIR)
+DATASET_FILE = 'landmarks.npy'  # (action, sequence, frame, 21, 3) float32, NaN where no hand was seen
 
 number_of_actions = 8 # Number of actions
+number_of_sequences = 30  # Number of sequences per action
 sequence_length = 30  # Number of frames per action sequence
 
-cap = cv2.VideoCapture(0)
+mp_hands = mp.solutions.hands
 
-for action in range(number_of_actions):
-    action_dir = os.path.join(DATA_DIR, str(action))
-    if not os.path.exists(action_dir):
-        os.makedirs(action_dir)
 
-    print(f'Collecting data for action {action}')
-    print('Press "Q" to start capturing video')
+def create_hands(max_hands=1, static_image_mode=False):
+    return mp_hands.Hands(static_image_mode=static_image_mode, max_num_hands=max_hands, min_detection_confidence=0.7)
 
-    # Wait for user to get ready
-    while True:
-        ret, frame = cap.read()
-        cv2.putText(frame, 'Press "Q" to start capturing', (100, 50), cv2.FONT_HERSHEY_SIMPLEX, 1.3, (0, 255, 0), 3, cv2.LINE_AA)
-        cv2.imshow('frame', frame)
-        if cv2.waitKey(25) == ord('q'):
-            break
 
-    print(f'Start capturing video for action {action}')
+# The (21, 3) landmarks of the first detected hand, or NaN when there is no hand
+def hand_points(results):
+    if not results.multi_hand_landmarks:
+        return np.full((21, 3), np.nan, dtype=np.float32)
+    hand_landmarks = results.multi_hand_landmarks[0]
+    return np.array([[lm.x, lm.y, lm.z] for lm in hand_landmarks.landmark], dtype=np.float32)
 
-    # Capture frames
-    for seq in range(30):  # Capture 10 sequences per action
-        print(f'Capturing sequence {seq + 1}')
-        frames = []
-        for _ in range(sequence_length):
-            ret, frame = cap.read()
-            if not ret:
-                print("Failed to capture frame")
+
+# Open the landmark dataset as a memory-mapped .npy file, creating it when it does not exist yet
+def open_dataset(path, shape):
+    if os.path.exists(path):
+        dataset = np.load(path, mmap_mode='r+')
+        if dataset.shape == shape:
+            return dataset
+        print(f'{path} has shape {dataset.shape}, creating a new one with shape {shape}')
+        del dataset
+    dataset = np.lib.format.open_memmap(path, mode='w+', dtype=np.float32, shape=shape)
+    dataset[:] = np.nan
+    return dataset
+
+
+# Encodes the optional .avi clips on a background thread so capture timing stays steady
+class VideoWriterThread:
+    def __init__(self, fps=10):
+        self.fps = fps
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def write_sequence(self, path, frames):
+        self._queue.put((path, frames))
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
                 break
-            frames.append(frame)
+            path, frames = item
+            out = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'XVID'), self.fps, (frames[0].shape[1], frames[0].shape[0]))
+            for f in frames:
+                out.write(f)
+            out.release()
+
+    # Wait for the queued clips to be written
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Collect hand landmark sequences for each action")
+    parser.add_argument('--source', default='0', help='Webcam index, video file or image directory')
+    parser.add_argument('--video', action='store_true', help='Also save every sequence as .data/<action>/<seq>.avi')
+    parser.add_argument('--fps', type=float, default=30, help='Capture rate while recording a sequence')
+    args = parser.parse_args()
+
+    if not os.path.exists(DATA_DIR):
+        os.makedirs(DATA_DIR)
+
+    dataset = open_dataset(os.path.join(DATA_DIR, DATASET_FILE),
+                           (number_of_actions, number_of_sequences, sequence_length, 21, 3))
+    video_writer = VideoWriterThread(fps=args.fps) if args.video else None  # Clips play back at the rate they were captured
+    hands = create_hands()
+    frame_interval = 1.0 / args.fps
+
+    cap = open_source(args.source)
+
+    for action in range(number_of_actions):
+        action_dir = os.path.join(DATA_DIR, str(action))
+        if args.video and not os.path.exists(action_dir):
+            os.makedirs(action_dir)
+
+        print(f'Collecting data for action {action}')
+        print('Press "Q" to start capturing video')
+
+        # Wait for user to get ready
+        while True:
+            ret, frame = cap.read()
+            cv2.putText(frame, 'Press "Q" to start capturing', (100, 50), cv2.FONT_HERSHEY_SIMPLEX, 1.3, (0, 255, 0), 3, cv2.LINE_AA)
             cv2.imshow('frame', frame)
-            cv2.waitKey(30)
+            if cv2.waitKey(25) == ord('q'):
+                break
+
+        print(f'Start capturing video for action {action}')
+
+        # Capture frames
+        for seq in range(number_of_sequences):
+            print(f'Capturing sequence {seq + 1}')
+            frames = []
+            next_frame_time = time.perf_counter()
+            for frame_number in range(sequence_length):
+                ret, frame = cap.read()
+                if not ret:
+                    print("Failed to capture frame")
+                    break
+
+                # Store the landmarks of this frame straight into the dataset
+                results = hands.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+                dataset[action, seq, frame_number] = hand_points(results)
+
+                if video_writer is not None:
+                    frames.append(frame)
+                cv2.imshow('frame', frame)
+                cv2.waitKey(1)
+
+                # Keep a steady capture rate
+                next_frame_time += frame_interval
+                delay = next_frame_time - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+
+            dataset.flush()
+            if video_writer is not None and frames:
+                video_writer.write_sequence(os.path.join(action_dir, f'{seq}.avi'), frames)
+
+    if video_writer is not None:
+        video_writer.close()
+    cap.release()
+    cv2.destroyAllWindows()
 
-        # Save frames as a sequence
-        sequence_path = os.path.join(action_dir, f'{seq}.avi')
-        out = cv2.VideoWriter(sequence_path, cv2.VideoWriter_fourcc(*'XVID'), 10, (frame.shape[1], frame.shape[0]))
-        for f in frames:
-            out.write(f)
-        out.release()
 
-cap.release()
-cv2.destroyAllWindows()
\ No newline at end of file
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,177 @@
+import os
+import sys
+import math
+from collections import deque
+import cv2
+import numpy as np
+import mediapipe as mp
+
+from gesture_index import create_index
+from gesture_detector import GestureDetector
+from sequence_classifier import SequenceModel, SlidingWindowClassifier
+from dtw_matcher import DTWMatcher
+from action import create_hands, hand_points
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from actuation import ModeAction
+from handtracks import HandTracks
+
+mp_hands = mp.solutions.hands
+mp_drawing = mp.solutions.drawing_utils
+
+default_sequence_model = os.path.join(".data", "sequence_model.npz")
+motion_frames = 30  # Registered motion gestures are matched over this many recent frames
+
+
+# The action model trained with sequence_classifier.py, or None when the file does not exist
+def open_sequence_model(path=default_sequence_model):
+    if not os.path.exists(path):
+        return None
+    return SequenceModel.load(path)
+
+
+# Keys for recorded actions from text like "0=LEFT,1=RIGHT": action number -> key
+def parse_action_keys(text):
+    action_keys = {}
+    for item in filter(None, text.split(",")):
+        action, key = item.split("=")
+        action_keys[int(action)] = key.upper()
+    return action_keys
+
+
+# Advanced mode one frame at a time, for advanced_mode.py, the launcher, replay.py, benchmark.py and
+# multicamera.py: every hand in view is scored against the gestures of the library, confirms its own
+# gesture and presses its key with its own cooldown. The first hand's recent frames are also matched
+# against the registered motion gestures and, with a sequence model, classified as a recorded action;
+# those two share one cooldown.
+class AdvancedInterpreter:
+    create_hands = staticmethod(create_hands)
+    max_hands = 1
+    track_hands = 1
+    idle_after = 30
+    mirror = False
+
+    def __init__(self, library, index="exact", confidence_threshold=0.8, required_frames=5, cooldown_time=1.0,
+                 max_hands=1, actuator=None, motion_threshold=1.0, sequence_model=None, action_keys=None):
+        self.library = library  # Keys, templates and motions of the registered gestures
+        self.max_hands = max_hands
+        self.actuator = actuator  # ActuationWorker for the key presses; None only decides them, e.g. in a replay
+        self.cooldown_time = cooldown_time
+        self.index = create_index(index)  # Feature vectors of all registered gestures, kept in memory
+        self.index.load_matrix(*library.feature_block())
+        self.detector = GestureDetector(self.index, confidence_threshold, required_frames, cooldown_time)
+        self.tracks = HandTracks(new_state=GestureDetector.new_state)
+        self.matches = []  # What the detector made of every hand of the last frame
+
+        self.motion_matcher = DTWMatcher(max_distance=motion_threshold)
+        for gesture_id, points in library.motions.items():
+            self.motion_matcher.add(gesture_id, points)
+        self.recent_points = deque(maxlen=motion_frames)
+        self.sequence_classifier = SlidingWindowClassifier(sequence_model) if sequence_model is not None else None
+        self.action_keys = dict(action_keys or {})  # Action number -> key
+        self.last_press_time = -math.inf  # Frame time of the last motion or action key press
+        self.motion_status = "Motion: N/A"
+        self.action_status = "Action: N/A"
+
+    # Register a static gesture from the feature vector of one hand
+    def add_gesture(self, gesture_id, key, feature):
+        self.index.add(gesture_id, feature)
+        self.library.add(gesture_id, key, feature=feature)
+
+    # Register a motion gesture from a (frames, 21, 3) recording; False if no hand was seen in it
+    def add_motion(self, gesture_id, key, points):
+        if not self.motion_matcher.add(gesture_id, points):
+            return False
+        self.library.add(gesture_id, key, motion=points)
+        return True
+
+    # Forget every registered gesture
+    def clear(self):
+        self.library.clear()
+        self.index.clear()
+        self.motion_matcher.clear()
+        self.recent_points.clear()
+
+    # Score the hands of a frame; returns the key presses that are due
+    def update(self, results, w, h, now):
+        hands = self.tracks.update(results)  # A hand that leaves drops its track, and with it its count
+        self.matches = self.detector.update(hands, self.tracks.points, now)
+        actions = [ModeAction("gesture", "press", (self.library.keys[match.gesture_id],), match.hand,
+                              f"gesture {match.gesture_id}", False)
+                   for match in self.matches if match.pressed]
+        if len(self.motion_matcher) or self.sequence_classifier is not None:
+            points = hand_points(results)
+            if len(self.motion_matcher):
+                actions += self._detect_motion(points, now)
+            if self.sequence_classifier is not None:
+                actions += self._detect_action(points, now)
+        return actions
+
+    # A key press for a motion or action, unless one was pressed less than cooldown_time ago
+    def _press(self, source, key, gesture, now):
+        if now - self.last_press_time < self.cooldown_time:
+            return []
+        self.last_press_time = now
+        return [ModeAction(source, "press", (key,), None, gesture, False)]
+
+    # Match the last motion_frames frames against the registered motion gestures
+    def _detect_motion(self, points, now):
+        self.recent_points.append(points)
+        if len(self.recent_points) < motion_frames:
+            return []
+        gesture_id, distance = self.motion_matcher.match(np.array(self.recent_points))
+        if gesture_id is None:
+            self.motion_status = "Motion: N/A"
+            return []
+        self.motion_status = (f"Motion: Gesture {gesture_id} (distance {distance:.2f}, "
+                              f"{self.motion_matcher.full_dtw_runs} of {len(self.motion_matcher)} compared)")
+        self.recent_points.clear()  # Start a fresh window so one motion triggers once
+        if gesture_id not in self.library.keys:
+            return []
+        return self._press("motion", self.library.keys[gesture_id], f"motion {gesture_id}", now)
+
+    # Feed the frame to the action classifier
+    def _detect_action(self, points, now):
+        detected = self.sequence_classifier.update(points)
+        if detected is None:
+            self.action_status = "Action: N/A"
+            return []
+        action, probability = detected
+        self.action_status = f"Action: {action} ({probability:.2f})"
+        key = self.action_keys.get(action)
+        if not key:
+            return []
+        return self._press("action", key, f"action {action}", now)
+
+    # Send the key presses to the actuator; returns the actions that were carried out
+    def actuate(self, actions, now):
+        if self.actuator is not None:
+            for action in actions:
+                self.actuator.submit(action.name, *action.args, origin=now)
+        return actions
+
+    # One line per hand of the last frame, with its confidence and key
+    def describe(self):
+        lines = []
+        for match in self.matches:
+            if match.gesture_id is not None:
+                lines.append(f"{match.hand.label()}: Confidence: {match.value:.2f} - Key: {self.library.keys[match.gesture_id]}")
+            else:
+                lines.append(f"{match.hand.label()}: No gesture detected. Confidence: N/A")
+        return lines or ["No hand detected. Confidence: N/A"]
+
+    # Draw the hands, the lines of describe() and the motion and action status on the frame of the last update
+    def draw(self, frame):
+        for match in self.matches:
+            mp_drawing.draw_landmarks(frame, match.hand.landmarks, mp_hands.HAND_CONNECTIONS)
+        lines = self.describe()
+        if len(self.motion_matcher):
+            lines.append(self.motion_status)
+        if self.sequence_classifier is not None:
+            lines.append(self.action_status)
+        for i, text in enumerate(lines):
+            cv2.putText(frame, text, (10, 30 + 30 * i), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2, cv2.LINE_AA)
+        return frame
+
+    def close(self):
+        pass
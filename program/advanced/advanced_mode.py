@@ -1,40 +1,176 @@
+import os
+import sys
+import argparse
 import cv2
 import tkinter as tk
 from tkinter import ttk, simpledialog
 from PIL import Image, ImageTk
-import os
 import shutil
-import pyautogui
-import json
-import numpy as np
 import mediapipe as mp
 import time
+import queue
+import threading
+import numpy as np
+from gesture_index import index_backends, landmarks_to_feature
+from advanced_interpreter import (AdvancedInterpreter, create_hands, default_sequence_model, motion_frames,
+                                  open_sequence_model, parse_action_keys)
+from dtw_matcher import trajectory
+from gesture_library import open_library, library_file, legacy_mapping_file, legacy_gesture_dir
+from action import hand_points
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from actuation import ActuationWorker
+from framesource import open_source
+from handtracker import HandTracker
+from scheduler import IdleScheduler
+from sharedlandmarks import LandmarkReader, default_name
+from metrics import add_metrics_arguments, create_metrics, draw_overlay
+from landmarktrace import TraceWriter
+
+parser = argparse.ArgumentParser(description="Advanced gesture mode")
+parser.add_argument("--source", default="0", help="Webcam index, video file or image directory")
+parser.add_argument("--sequence-model", default=default_sequence_model,
+                    help="Action model trained with sequence_classifier.py, used when the file exists")
+parser.add_argument("--action-keys", default="", help="Keys for recorded actions, e.g. 0=LEFT,1=RIGHT")
+parser.add_argument("--max-hands", type=int, default=1, help="Hands recognized at once, e.g. several users in front of one screen")
+parser.add_argument("--idle-after", type=int, default=30, help="Frames without a hand before detection slows down (0 = never)")
+parser.add_argument("--idle-fps", type=float, default=3.0, help="Detection rate while no hand is in view")
+parser.add_argument("--attach", nargs="?", const=default_name, help="Use frames and landmarks from sharedlandmarks.py instead of the camera")
+parser.add_argument("--display-fps", type=float, default=30, help="How often the camera view is redrawn")
+parser.add_argument("--index", choices=list(index_backends), default="exact",
+                    help="Similarity search over the gesture templates; cluster is faster for libraries of many thousands")
+parser.add_argument("--record", help="Record the landmarks and key presses of this session to a trace file for replay.py")
+parser.add_argument("--motion-threshold", type=float, default=1.0, help="Largest DTW distance that matches a motion gesture")
+add_metrics_arguments(parser)
+args = parser.parse_args()
 
 # Initialize cooldown timer and smoothing parameters
 cooldown_time = 1.0  # Time in seconds between allowed presses
-last_press_time = time.time()
-frames_with_gesture = 0
 required_frames = 5  # Number of consecutive frames to confirm a gesture
 
-# Directory and file definitions
-gesture_dir = "gestures"
-gesture_file = "gesture_key_mapping.json"
-current_gesture_index = 0
 is_gesture_registered = False
-gesture_key_mapping = {}
+# Every hand in view has a track ID, a handedness and its own gesture confirmation and cooldown, and the
+# recent frames are matched against the motion gestures and actions; created with the library by load_gestures()
+interpreter = None
+library = None  # interpreter.library: keys, templates and motions of the registered gestures, saved to library_file
 is_running = False  # Flag to indicate if gesture detection is running
 
+# Recognize the recorded motion actions over the last frames, if a trained model is available
+sequence_model = open_sequence_model(args.sequence_model)
+action_keys = parse_action_keys(args.action_keys)
+
 # Initialize MediaPipe hand detector
 mp_hands = mp.solutions.hands
-hands = mp_hands.Hands(static_image_mode=False, max_num_hands=1, min_detection_confidence=0.7)
+if args.attach:
+    # The daemon owns the camera and the model; the reader returns its frames and the landmarks found on them
+    cap = scheduler = LandmarkReader(args.attach, copy_frames=True)  # Frames are kept for registering gestures
+else:
+    hands = create_hands(args.max_hands)
+    search_hands = create_hands(args.max_hands, static_image_mode=True)
+    tracker = HandTracker(hands, max_hands=args.max_hands, search_hands=search_hands)  # Runs the detector on a crop around the hands once they are found
+    scheduler = IdleScheduler(tracker, idle_after=args.idle_after, idle_fps=args.idle_fps)  # Slows down with nobody in view
 mp_drawing = mp.solutions.drawing_utils  # Utility for drawing landmarks
 
-# Create the directory to store gesture images if it doesn't exist
-if not os.path.exists(gesture_dir):
-    os.makedirs(gesture_dir)
-
-# Initialize the webcam
-cap = cv2.VideoCapture(0)
+# Initialize the webcam (or the recording given with --source)
+if not args.attach:
+    cap = open_source(args.source)
+
+# Stage latencies, camera-to-key-press latency, frame rate and dropped frames
+metrics = create_metrics("advanced", args)
+
+# Key presses run on their own thread so pyautogui's pause does not stall the camera feed
+actuator = ActuationWorker(on_executed=metrics.actuated).start()
+
+# Size of the camera view; frames of any other shape are letterboxed into it
+canvas_width, canvas_height = 640, 480
+
+# Scale a BGR frame to fit the camera view without distorting it; black bars fill the rest
+def letterbox(frame, size=(canvas_width, canvas_height)):
+    width, height = size
+    h, w = frame.shape[:2]
+    scale = min(width / w, height / h)
+    fitted = cv2.resize(frame, (max(1, round(w * scale)), max(1, round(h * scale))))
+    if fitted.shape[:2] == (height, width):
+        return fitted
+    boxed = np.zeros((height, width, 3), dtype=np.uint8)
+    y, x = (height - fitted.shape[0]) // 2, (width - fitted.shape[1]) // 2
+    boxed[y:y + fitted.shape[0], x:x + fitted.shape[1]] = fitted
+    return boxed
+
+# Reads frames and runs hand detection on a background thread so the window never waits for them.
+# Every frame's results go to the Tk loop through a bounded queue (the oldest is dropped when the
+# window falls behind); an RGB image for the canvas is only prepared at the display rate.
+class VisionWorker:
+    def __init__(self, cap, detector, metrics, display_size=(canvas_width, canvas_height), display_fps=30, maxsize=30):
+        self.cap = cap
+        self.detector = detector
+        self.metrics = metrics
+        self.display_size = display_size
+        self.display_interval = 1.0 / display_fps
+        self.results = queue.Queue(maxsize=maxsize)
+        self.dropped = 0
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        next_display = 0.0
+        timer = self.metrics.timer()
+        while self._running:
+            timer.start()
+            ret, frame = self.cap.read()
+            if not ret:
+                time.sleep(0.01)
+                continue
+            frame_time = getattr(self.cap, "frame_time", None) or time.perf_counter()
+            timer.lap("capture")
+            self.metrics.frame()
+            if hasattr(self.cap, "frames_dropped"):
+                self.metrics.set_dropped("camera", self.cap.frames_dropped)
+            results = self.detector.process(frame)
+            timer.lap("inference")
+
+            display = None
+            now = time.perf_counter()
+            if now >= next_display:
+                next_display = now + self.display_interval
+                display = frame.copy()  # The frame itself stays clean for registering gestures
+                for hand_landmarks in results.multi_hand_landmarks or []:
+                    mp_drawing.draw_landmarks(display, hand_landmarks, mp_hands.HAND_CONNECTIONS)
+                display = letterbox(display, self.display_size)
+                if args.overlay:
+                    draw_overlay(display, self.metrics)
+                display = cv2.cvtColor(display, cv2.COLOR_BGR2RGB)
+                timer.lap("draw")
+
+            item = (frame, results, display, self.detector.status(), frame_time, time.perf_counter())
+            try:
+                self.results.put_nowait(item)
+            except queue.Full:
+                try:
+                    self.results.get_nowait()
+                    self.dropped += 1
+                    self.metrics.set_dropped("queue", self.dropped)
+                except queue.Empty:
+                    pass
+                self.results.put_nowait(item)
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join()
+
+vision = VisionWorker(cap, scheduler, metrics, display_fps=args.display_fps)
+ui_timer = metrics.timer()
+latest_frame = None  # Newest frame and results handed over by the vision worker
+latest_results = None
+latest_frame_time = None  # When the newest frame arrived, for the camera-to-key-press latency
+motion_recording = None  # Landmarks collected while a motion gesture is being registered
 
 # Create the main tkinter window
 root = tk.Tk()
@@ -45,139 +181,138 @@ root.config(bg="#2c3e50")  # Set background color
 # Define confidence threshold for gesture recognition
 confidence_threshold = 0.8  # Adjust this based on your needs
 
-# Load existing gestures from the JSON file if available
+# Landmarks of every frame and every key press, for replaying the session without the camera; created
+# once the library is loaded, since the trace names the templates it was recorded with
+recorder = None
+recorded_library = None  # feature_digest() of the templates the recorded frames were matched against
+
+# Note in the trace that the templates changed, so a replay only checks the actions before that
+def record_library_change():
+    global recorded_library
+    digest = library.feature_digest()
+    if recorder is not None and digest != recorded_library:
+        recorder.add_action("library", "change", digest)
+        recorded_library = digest
+
+# Load existing gestures from the gesture library if available
 def load_gestures():
-    global gesture_key_mapping, current_gesture_index
-    if os.path.exists(gesture_file):
-        with open(gesture_file, "r") as f:
-            gesture_key_mapping = json.load(f)
-            current_gesture_index = len(gesture_key_mapping)
+    global interpreter, library
+    interpreter = AdvancedInterpreter(open_library(), args.index, confidence_threshold, required_frames, cooldown_time,
+                                      args.max_hands, actuator, args.motion_threshold, sequence_model, action_keys)
+    library = interpreter.library
+    if len(library):
         status_label.config(text="Loaded existing gestures.")
     else:
         status_label.config(text="No saved gestures found.")
 
 # Function to update the camera feed in the Tkinter canvas
 def update_frame():
-    if not is_gesture_registered:  # Only update the feed if no gesture is registered
-        ret, frame = cap.read()
-        if ret:
-            frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            
-            # Use MediaPipe to detect hand landmarks
-            results = hands.process(frame_rgb)
-            
-            # Draw landmarks on the frame if hands are detected
-            if results.multi_hand_landmarks:
-                for hand_landmarks in results.multi_hand_landmarks:
-                    mp_drawing.draw_landmarks(frame, hand_landmarks, mp_hands.HAND_CONNECTIONS)
-            
-            # Convert frame to display in tkinter
-            img = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
-            img_tk = ImageTk.PhotoImage(image=img)
-            canvas.create_image(0, 0, anchor=tk.NW, image=img_tk)
-            canvas.img_tk = img_tk  # Keep a reference to avoid garbage collection
-        
+    global latest_frame, latest_results, latest_frame_time, motion_recording
+    display = None
+    status = None
+    while True:
+        try:
+            frame, results, rgb, status, frame_time, queued_at = vision.results.get_nowait()
+        except queue.Empty:
+            break
+        ui_timer.start(queued_at)
+        ui_timer.lap("queue")  # Time the results waited for the window
+        latest_frame, latest_results, latest_frame_time = frame, results, frame_time
+
+        if motion_recording is not None:
+            motion_recording.append(hand_points(results))
+            if len(motion_recording) == motion_frames:
+                points, motion_recording = motion_recording, None
+                finish_motion(np.array(points, dtype=np.float32))
+
+        if is_gesture_registered:  # Keep showing the registered gesture until "Compile"
+            continue
+        if rgb is not None:
+            display = rgb
+
         if is_running:
-            # Detect gesture from the current frame
-            gesture_id = detect_gesture(frame, results)
-            if gesture_id is not None:
-                perform_key_action(gesture_id)  # Only press key if gesture is detected
-    
+            # Only frames that go through detection are recorded, so a replay sees what detect_gesture saw
+            if recorder is not None:
+                recorder.add_frame(frame_time, results, frame.shape)
+
+            # Detect gestures, motion gestures and actions from the current frame; keys are only pressed
+            # for confirmed gestures, and at most once per cooldown
+            h, w = frame.shape[:2]
+            for action in interpreter.actuate(interpreter.update(results, w, h, frame_time), frame_time):
+                if recorder is not None:
+                    recorder.add_action(action.source, action.name, *action.args)
+                source = f" by hand {action.hand.label()}" if action.hand is not None else ""
+                print(f"Performed action for {action.gesture}{source}: Pressed {action.args[0]} "
+                      f"(queue {actuator.queue_depth()}, lag {actuator.last_lag * 1000:.0f} ms)")
+            for label, text in ((confidence_label, "\n".join(interpreter.describe())),
+                                (motion_label, interpreter.motion_status), (action_label, interpreter.action_status)):
+                if label.cget("text") != text:
+                    label.config(text=text)
+            ui_timer.lap("classify")
+
+    # Only the newest frame is drawn, into the pixels of the one canvas image
+    if display is not None:
+        ui_timer.start()
+        camera_photo.paste(Image.fromarray(display))
+        ui_timer.lap("render")
+    if status is not None:
+        detection_status = f"Detection: {status}"
+        if detection_label.cget("text") != detection_status:
+            detection_label.config(text=detection_status)
+
     root.after(10, update_frame)
-    
-# Function to detect gestures using hand landmarks
-def detect_gesture(frame, results):
-    global last_detected_gesture_id, frames_with_gesture
-    if not results.multi_hand_landmarks:
-        confidence_label.config(text="No hand detected. Confidence: N/A")
-        last_detected_gesture_id = None
-        frames_with_gesture = 0  # Reset count if no hand is detected
-        return None
-
-    hand_landmarks = results.multi_hand_landmarks[0]  # Assume one hand detected
-    landmarks = []
-    for lm in hand_landmarks.landmark:
-        landmarks.append([lm.x, lm.y, lm.z])
-
-    # Feature extraction: Normalize the landmarks (You can extract more features here if needed)
-    # For example, you can compute the relative distances between key points, angles, etc.
-    feature_vector = np.array([lm[0] for lm in landmarks] + [lm[1] for lm in landmarks] + [lm[2] for lm in landmarks])
-
-    best_match_id = None
-    best_match_value = 0
-
-    # Compare the extracted feature vector with the previously stored gesture vectors
-    for gesture_id, key in gesture_key_mapping.items():
-        gesture_path = os.path.join(gesture_dir, f"gesture_{gesture_id}.json")
-        
-        if os.path.exists(gesture_path):
-            # Load the pre-stored feature vector for the gesture
-            with open(gesture_path, "r") as f:
-                saved_feature_vector = np.array(json.load(f))
 
-            # Calculate the similarity (cosine similarity, Euclidean distance, etc.)
-            similarity = np.dot(feature_vector, saved_feature_vector) / (np.linalg.norm(feature_vector) * np.linalg.norm(saved_feature_vector))
-            
-            if similarity > best_match_value and similarity >= confidence_threshold:
-                best_match_value = similarity
-                best_match_id = gesture_id
-
-    if best_match_id is not None and best_match_value >= confidence_threshold:
-        frames_with_gesture += 1  # Count frames with detected gesture
-        if frames_with_gesture >= required_frames:
-            last_detected_gesture_id = best_match_id
-            matched_key = gesture_key_mapping[best_match_id]
-            confidence_label.config(text=f"Confidence: {best_match_value:.2f} - Key: {matched_key}")
-            return best_match_id
-    else:
-        confidence_label.config(text="No gesture detected. Confidence: N/A")
-        last_detected_gesture_id = None
-        frames_with_gesture = 0  # Reset if no consistent gesture is detected
-    return None
+# Show a BGR frame in the camera view, e.g. the frame a gesture was registered from
+def show_image(frame):
+    camera_photo.paste(Image.fromarray(cv2.cvtColor(letterbox(frame), cv2.COLOR_BGR2RGB)))
+
+# Function to record a motion gesture over several frames and assign a key
+def register_motion():
+    global motion_recording
+    status_label.config(text="Recording motion...")
+    motion_recording = []  # Filled by update_frame, which calls finish_motion after motion_frames frames
+
+def finish_motion(points):
+    if trajectory(points, interpreter.motion_matcher.length) is None:
+        status_label.config(text="No hand seen, motion not registered.")
+        return
+
+    # Ask the user to input the keyboard key for this motion
+    gesture_id = library.next_id()
+    key = simpledialog.askstring("Assign Key", f"Enter a key for Gesture {gesture_id+1}:")
+    if key:
+        interpreter.add_motion(gesture_id, key.upper(), points)
+        library.save(library_file)
+        status_label.config(text=f"Motion {gesture_id+1} assigned to key '{key.upper()}'!")
 
 # Function to register a new gesture and assign a key
 def register_gesture():
-    global current_gesture_index, is_gesture_registered
-    ret, frame = cap.read()
-    if ret:
-        # Save the current frame as an image in the gesture folder
-        file_path = os.path.join(gesture_dir, f"gesture_{current_gesture_index}.png")
-        cv2.imwrite(file_path, frame)
-        
+    global is_gesture_registered
+    frame, results = latest_frame, latest_results
+    if frame is not None:
+        if not results.multi_hand_landmarks:
+            status_label.config(text="No hand seen, gesture not registered.")
+            return
+
         # Extract hand landmarks and create a feature vector
-        frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        results = hands.process(frame_rgb)
-        if results.multi_hand_landmarks:
-            hand_landmarks = results.multi_hand_landmarks[0]
-            landmarks = [[lm.x, lm.y, lm.z] for lm in hand_landmarks.landmark]
-            feature_vector = np.array([lm[0] for lm in landmarks] + [lm[1] for lm in landmarks] + [lm[2] for lm in landmarks])
-            
-            # Save the feature vector to a JSON file
-            gesture_feature_path = os.path.join(gesture_dir, f"gesture_{current_gesture_index}.json")
-            with open(gesture_feature_path, "w") as f:
-                json.dump(feature_vector.tolist(), f)
+        hand_landmarks = results.multi_hand_landmarks[0]
+        feature_vector = landmarks_to_feature(hand_landmarks)
         
         # Ask the user to input the keyboard key for this gesture
-        key = simpledialog.askstring("Assign Key", f"Enter a key for Gesture {current_gesture_index+1}:")
+        gesture_id = library.next_id()
+        key = simpledialog.askstring("Assign Key", f"Enter a key for Gesture {gesture_id+1}:")
         
         if key:
-            # Map the gesture to the provided key
-            gesture_key_mapping[current_gesture_index] = key.upper()
-            current_gesture_index += 1
-            
-            # Save the gesture-key mappings to the JSON file
-            with open(gesture_file, "w") as f:
-                json.dump(gesture_key_mapping, f)
+            # Map the gesture to the provided key and save the library
+            interpreter.add_gesture(gesture_id, key.upper(), feature_vector)
+            library.save(library_file)
+            record_library_change()
             
             # Update the status label
-            status_label.config(text=f"Gesture {current_gesture_index} assigned to key '{key.upper()}'!")
+            status_label.config(text=f"Gesture {gesture_id+1} assigned to key '{key.upper()}'!")
             
-            # Show the saved gesture image in the canvas
-            img = Image.open(file_path)
-            img = img.resize((640, 480))  # Resize the image to fit the canvas
-            img_tk = ImageTk.PhotoImage(img)
-            canvas.create_image(0, 0, anchor=tk.NW, image=img_tk)
-            canvas.img_tk = img_tk  # Keep a reference
+            # Show the frame the gesture was registered from in the canvas
+            show_image(frame)
             
             is_gesture_registered = True
 
@@ -186,33 +321,21 @@ def register_gesture():
 
 # Function to reset the application and clear registered gestures
 def reset_app():
-    global current_gesture_index, is_gesture_registered, gesture_key_mapping
-    # Delete all previously saved gesture images and the JSON file
-    if os.path.exists(gesture_dir):
-        shutil.rmtree(gesture_dir)
-    os.makedirs(gesture_dir)  # Recreate the folder after deletion
-    
-    if os.path.exists(gesture_file):
-        os.remove(gesture_file)  # Remove the JSON file
+    global is_gesture_registered
+    # Delete the gesture library, and the files of older versions so they are not moved into it again
+    if os.path.exists(library_file):
+        os.remove(library_file)
+    if os.path.exists(legacy_gesture_dir):
+        shutil.rmtree(legacy_gesture_dir)
+    if os.path.exists(legacy_mapping_file):
+        os.remove(legacy_mapping_file)
     
     # Reset the application state
-    current_gesture_index = 0
-    gesture_key_mapping = {}
+    interpreter.clear()
+    record_library_change()
     is_gesture_registered = False
     status_label.config(text="All gestures have been reset.")
-    canvas.delete("all")  # Clear the canvas
-    update_frame()  # Resume showing the live camera feed
-
-# Function to simulate key press based on detected gesture
-def perform_key_action(gesture_id):
-    global last_press_time
-    if gesture_id is not None and gesture_id in gesture_key_mapping:
-        current_time = time.time()
-        if current_time - last_press_time >= cooldown_time:
-            key = gesture_key_mapping[gesture_id]
-            pyautogui.press(key)
-            last_press_time = current_time  # Update the last press time
-            print(f"Performed action for Gesture {gesture_id}: Pressed {key}")
+    camera_photo.paste(Image.new("RGB", (canvas_width, canvas_height)))  # Clear the canvas until the next frame
 
 # Function to proceed to the next frame or reset the registration state
 def go_home():
@@ -231,12 +354,15 @@ main_frame = tk.Frame(root, bg="#34495e", padx=10, pady=10)
 main_frame.pack(fill="both", expand=True)
 
 # Create a frame for the camera feed
-camera_frame = tk.Frame(main_frame, width=640, height=480, bg="#ecf0f1", bd=2, relief="sunken")
+camera_frame = tk.Frame(main_frame, width=canvas_width, height=canvas_height, bg="#ecf0f1", bd=2, relief="sunken")
 camera_frame.grid(row=0, column=0, padx=20, pady=20)
 
 # Create a canvas for displaying the camera feed inside the camera frame
-canvas = tk.Canvas(camera_frame, width=640, height=480)
+canvas = tk.Canvas(camera_frame, width=canvas_width, height=canvas_height)
 canvas.pack()
+# One image item for the whole session; new frames are pasted into its pixels
+camera_photo = ImageTk.PhotoImage("RGB", (canvas_width, canvas_height))
+canvas.create_image(0, 0, anchor=tk.NW, image=camera_photo)
 
 # Create a control frame for buttons and labels
 control_frame = tk.Frame(main_frame, bg="#34495e")
@@ -244,6 +370,15 @@ control_frame.grid(row=0, column=1, padx=20, pady=20, sticky="n")
 # Create a label to display the confidence level and matched key
 confidence_label = tk.Label(control_frame, text="Confidence: N/A", font=("Helvetica", 12), fg="white", bg="#34495e")
 confidence_label.grid(row=6, column=0, pady=10)
+# Create a label to display the recognized motion action
+action_label = tk.Label(control_frame, text="Action: N/A", font=("Helvetica", 12), fg="white", bg="#34495e")
+action_label.grid(row=7, column=0, pady=10)
+# Create a label to display the matched motion gesture
+motion_label = tk.Label(control_frame, text="Motion: N/A", font=("Helvetica", 12), fg="white", bg="#34495e")
+motion_label.grid(row=8, column=0, pady=10)
+# Create a label to display whether detection runs at full rate or idles
+detection_label = tk.Label(control_frame, text="Detection: N/A", font=("Helvetica", 12), fg="white", bg="#34495e")
+detection_label.grid(row=10, column=0, pady=10)
 
 
 
@@ -268,17 +403,31 @@ button3.grid(row=3, column=0, pady=10, padx=10, sticky="ew")
 button_run = ttk.Button(control_frame, text="Run", command=run_gestures)
 button_run.grid(row=4, column=0, pady=10, padx=10, sticky="ew")
 
+# Add the "Register Motion" button to record a moving gesture
+button_motion = ttk.Button(control_frame, text="Register Motion", command=register_motion)
+button_motion.grid(row=9, column=0, pady=10, padx=10, sticky="ew")
+
 # Create a status label to display messages to the user
 status_label = tk.Label(control_frame, text="No gestures registered.", font=("Helvetica", 12), fg="white", bg="#34495e")
 status_label.grid(row=5, column=0, pady=20)
 
 # Start updating the camera feed
 load_gestures()  # Load saved gestures on startup
+if args.record:
+    recorded_library = library.feature_digest()
+    recorder = TraceWriter(args.record, "advanced", {"index": args.index, "confidence_threshold": confidence_threshold,
+                                                     "required_frames": required_frames, "cooldown_time": cooldown_time,
+                                                     "library": recorded_library}, max_hands=args.max_hands)
+vision.start()
 update_frame()
 
 # Start the Tkinter event loop
 root.mainloop()
 
 # Release the webcam and close OpenCV windows
+vision.stop()
+if recorder is not None:
+    recorder.close()
+actuator.stop()
 cap.release()
 cv2.destroyAllWindows()
\ No newline at end of file
@@ -0,0 +1,125 @@
+import math
+import numpy as np
+
+from sequence_classifier import frame_features
+
+
+# Resample a (frames, features) trajectory to a fixed number of frames by linear interpolation
+def resample(trajectory, length):
+    trajectory = np.asarray(trajectory, dtype=np.float32)
+    positions = np.linspace(0, len(trajectory) - 1, length)
+    lower = np.floor(positions).astype(int)
+    upper = np.minimum(lower + 1, len(trajectory) - 1)
+    weight = (positions - lower)[:, None].astype(np.float32)
+    return trajectory[lower] * (1 - weight) + trajectory[upper] * weight
+
+
+# Frame features of a (frames, 21, 3) recording without the frames where no hand was seen,
+# resampled to the given length; None when fewer than two frames had a hand
+def trajectory(points, length):
+    features = frame_features(points)
+    features = features[~np.isnan(features[:, 0])]
+    if len(features) < 2:
+        return None
+    return resample(features, length)
+
+
+# DTW distance (sum of squared frame distances) inside a Sakoe-Chiba band of the given radius.
+# Gives up and returns inf as soon as the partial cost plus the lower bound of the remaining
+# frames (remaining_bound[i] covers query frames i and later) cannot beat best_so_far.
+def dtw_distance(query, template, radius, best_so_far=math.inf, remaining_bound=None):
+    n = len(query)
+    cost = ((query[:, None, :] - template[None, :, :]) ** 2).sum(axis=2).tolist()
+    inf = math.inf
+    previous = [inf] * n
+    for i in range(n):
+        row = cost[i]
+        current = [inf] * n
+        left = inf
+        row_min = inf
+        for j in range(max(0, i - radius), min(n, i + radius + 1)):
+            if i == 0 and j == 0:
+                best = 0.0
+            else:
+                best = previous[j]
+                if j > 0:
+                    if previous[j - 1] < best:
+                        best = previous[j - 1]
+                    if left < best:
+                        best = left
+            left = best + row[j]
+            current[j] = left
+            if left < row_min:
+                row_min = left
+        bound = remaining_bound[i + 1] if remaining_bound is not None and i + 1 < n else 0.0
+        if row_min + bound >= best_so_far:
+            return inf
+        previous = current
+    return previous[n - 1]
+
+
+# Matches a live trajectory against registered motion templates with dynamic time warping.
+# Templates are resampled to one length and stored with their LB_Keogh envelopes, so every
+# template gets a cheap lower bound in one array operation and full DTW only runs, in order
+# of increasing bound, until the bound exceeds the best distance found so far.
+class DTWMatcher:
+    def __init__(self, length=32, radius=3, max_distance=1.0):
+        self.length = length  # Frames every trajectory is resampled to
+        self.radius = radius  # Warping band in frames
+        self.max_distance = max_distance  # Largest mean per-frame distance that still matches
+        self.ids = []
+        self._templates = []
+        self._upper = np.zeros((0, length, 0), dtype=np.float32)
+        self._lower = np.zeros((0, length, 0), dtype=np.float32)
+        self.full_dtw_runs = 0  # How many templates needed full DTW in the last match
+
+    def __len__(self):
+        return len(self.ids)
+
+    # Register a (frames, 21, 3) landmark recording of a motion gesture; False if it had no hand
+    def add(self, gesture_id, points):
+        template = trajectory(points, self.length)
+        if template is None:
+            return False
+        windows = np.lib.stride_tricks.sliding_window_view(
+            np.pad(template, ((self.radius, self.radius), (0, 0)), mode='edge'), 2 * self.radius + 1, axis=0)
+        upper, lower = windows.max(axis=2), windows.min(axis=2)
+        self.ids.append(gesture_id)
+        self._templates.append(template)
+        if len(self.ids) == 1:
+            self._upper, self._lower = upper[None], lower[None]
+        else:
+            self._upper = np.concatenate([self._upper, upper[None]])
+            self._lower = np.concatenate([self._lower, lower[None]])
+        return True
+
+    def clear(self):
+        self.__init__(self.length, self.radius, self.max_distance)
+
+    # Best matching template for a (frames, 21, 3) live recording: (gesture_id, mean distance) or (None, inf)
+    def match(self, points):
+        self.full_dtw_runs = 0
+        query = trajectory(points, self.length) if self.ids else None
+        if query is None:
+            return None, math.inf
+
+        # LB_Keogh: distance from the query to each template's envelope, per query frame
+        outside = np.clip(query[None], self._lower, self._upper)
+        outside -= query
+        frame_bounds = np.einsum('ktd,ktd->kt', outside, outside)
+        bounds = frame_bounds.sum(axis=1)
+        remaining = np.cumsum(frame_bounds[:, ::-1], axis=1)[:, ::-1]
+
+        best_distance = self.max_distance * self.length
+        best_id = None
+        for k in np.argsort(bounds):
+            if bounds[k] >= best_distance:
+                break  # Every remaining template has a larger lower bound
+            self.full_dtw_runs += 1
+            distance = dtw_distance(query, self._templates[k], self.radius, best_distance, remaining[k].tolist())
+            if distance < best_distance:
+                best_distance = distance
+                best_id = self.ids[k]
+        if best_id is None:
+            return None, math.inf
+        return best_id, best_distance / self.length
@@ -0,0 +1,121 @@
+import os
+import time
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import cv2
+import numpy as np
+
+from action import DATA_DIR, create_hands, hand_points
+
+# Part of the cache key; changed whenever the landmarks of a clip would come out differently
+extraction_version = 3  # 2: a fresh Hands per clip, 3: one static-image Hands per worker
+
+hands = None  # One MediaPipe Hands instance per worker process
+
+
+# Runs once in every worker process. In static image mode every frame is detected on its own, so the
+# Hands carries nothing over from one clip to the next and the worker can reuse it for all of them.
+def init_worker():
+    global hands
+    hands = create_hands(static_image_mode=True)
+
+
+def file_hash(path):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# Find the .data/<action>/<seq>.avi clips as (action, seq, path)
+def find_clips(data_dir):
+    clips = []
+    for action_name in os.listdir(data_dir):
+        action_dir = os.path.join(data_dir, action_name)
+        if not action_name.isdigit() or not os.path.isdir(action_dir):
+            continue
+        for file_name in os.listdir(action_dir):
+            seq_name, extension = os.path.splitext(file_name)
+            if extension.lower() == '.avi' and seq_name.isdigit():
+                clips.append((int(action_name), int(seq_name), os.path.join(action_dir, file_name)))
+    return sorted(clips)
+
+
+# Landmarks of every frame of one clip, taken from the cache when the clip content is unchanged.
+# Runs in a worker process; returns (path, landmarks, frames processed, cache hit).
+def extract_clip(path, cache_dir):
+    cache_path = os.path.join(cache_dir, f'{file_hash(path)}.v{extraction_version}.npy')
+    if os.path.exists(cache_path):
+        return path, np.load(cache_path), 0, True
+
+    points = []
+    cap = cv2.VideoCapture(path)
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        points.append(hand_points(hands.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))))
+    cap.release()
+    landmarks = np.array(points, dtype=np.float32).reshape(-1, 21, 3)
+
+    # Write under a temporary name first so an interrupted run never leaves a partial cache entry
+    temp_path = f'{cache_path}.{os.getpid()}.tmp'
+    with open(temp_path, 'wb') as f:
+        np.save(f, landmarks)
+    os.replace(temp_path, cache_path)
+    return path, landmarks, len(landmarks), False
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Extract hand landmarks from the recorded .avi clips in parallel")
+    parser.add_argument('--data', default=DATA_DIR, help='Directory with <action>/<seq>.avi clips')
+    parser.add_argument('--output', default=os.path.join(DATA_DIR, 'video_landmarks.npy'),
+                        help='Consolidated (action, sequence, frame, 21, 3) landmark file')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Number of worker processes')
+    args = parser.parse_args()
+
+    cache_dir = os.path.join(args.data, 'cache')  # <content hash>.v<extraction version>.npy per clip
+    os.makedirs(cache_dir, exist_ok=True)
+
+    clips = find_clips(args.data)
+    if not clips:
+        print(f'No clips found under {args.data}')
+        return
+    print(f'Extracting landmarks from {len(clips)} clips with {args.workers} workers')
+
+    results = {}
+    frames_processed = 0
+    cached = 0
+    start_time = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=init_worker) as pool:
+        futures = [pool.submit(extract_clip, path, cache_dir) for _, _, path in clips]
+        for done, future in enumerate(as_completed(futures), 1):
+            path, landmarks, frame_count, from_cache = future.result()
+            results[path] = landmarks
+            frames_processed += frame_count
+            cached += from_cache
+            elapsed = time.perf_counter() - start_time
+            print(f'\r{done}/{len(clips)} clips, {cached} cached, {frames_processed / elapsed:.1f} frames/s',
+                  end='', flush=True)
+    print()
+
+    # Consolidate into one array, padding shorter clips with NaN
+    actions = max(action for action, _, _ in clips) + 1
+    sequences = max(seq for _, seq, _ in clips) + 1
+    length = max(len(landmarks) for landmarks in results.values())
+    dataset = np.full((actions, sequences, length, 21, 3), np.nan, dtype=np.float32)
+    for action, seq, path in clips:
+        landmarks = results[path]
+        dataset[action, seq, :len(landmarks)] = landmarks
+
+    temp_path = args.output + '.tmp'
+    with open(temp_path, 'wb') as f:
+        np.save(f, dataset)
+    os.replace(temp_path, args.output)
+    print(f'Wrote {args.output} with shape {dataset.shape} in {time.perf_counter() - start_time:.1f} s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+import math
+from collections import namedtuple
+
+from gesture_index import points_to_features
+
+# What the detector made of one hand in one frame; gesture_id is None when nothing matched
+GestureMatch = namedtuple("GestureMatch", "hand gesture_id value confirmed pressed")
+
+
+# Advanced mode's rule for pressing the key of a registered gesture: a hand has to match a
+# registered gesture with at least confidence_threshold for required_frames frames in a row, and then
+# presses at most once per cooldown_time seconds. Time is the capture time of the frame, so a replayed
+# session makes exactly the decisions of the live one, however fast it runs.
+class GestureDetector:
+    def __init__(self, index, confidence_threshold=0.8, required_frames=5, cooldown_time=1.0):
+        self.index = index
+        self.confidence_threshold = confidence_threshold
+        self.required_frames = required_frames
+        self.cooldown_time = cooldown_time
+
+    # State kept per hand track, e.g. HandTracks(new_state=GestureDetector.new_state)
+    @staticmethod
+    def new_state():
+        return {"frames_with_gesture": 0, "last_press_time": -math.inf}
+
+    # Score all hands of a frame against the templates in one step; points is the (N, 21, 3) array of the hands
+    def update(self, hands, points, now):
+        if not hands:
+            return []
+        ids, values = self.index.best_matches(points_to_features(points))
+        matches = []
+        for hand, gesture_id, value in zip(hands, ids, values):
+            state = hand.state
+            confirmed = pressed = False
+            if gesture_id is not None and value >= self.confidence_threshold:
+                state["frames_with_gesture"] += 1  # Count frames with detected gesture
+                confirmed = state["frames_with_gesture"] >= self.required_frames
+                if confirmed and now - state["last_press_time"] >= self.cooldown_time:
+                    state["last_press_time"] = now
+                    pressed = True
+            else:
+                state["frames_with_gesture"] = 0  # Reset if no consistent gesture is detected
+                gesture_id = None
+            matches.append(GestureMatch(hand, gesture_id, float(value), confirmed, pressed))
+        return matches
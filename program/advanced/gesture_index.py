@@ -0,0 +1,263 @@
+import time
+import argparse
+import numpy as np
+
+# Number of values in a feature vector (21 landmarks x 3 coordinates)
+feature_size = 63
+
+
+# Build the feature vector for one hand: all x values, then all y values, then all z values
+def landmarks_to_feature(hand_landmarks):
+    points = np.array([[lm.x, lm.y, lm.z] for lm in hand_landmarks.landmark], dtype=np.float32)
+    return points.T.ravel()
+
+
+# Feature vectors of a whole (N, 21, 3) array of hands, one row per hand
+def points_to_features(points):
+    points = np.asarray(points, dtype=np.float32)
+    return points.transpose(0, 2, 1).reshape(len(points), feature_size)
+
+
+# Keeps every registered gesture template in one pre-normalized matrix so that a frame
+# can be scored against all of them with a single matrix-vector product. Exact, and the
+# fastest choice up to a few thousand templates.
+class GestureIndex:
+    def __init__(self, capacity=64):
+        self.ids = []
+        self._matrix = np.zeros((capacity, feature_size), dtype=np.float32)
+
+    def __len__(self):
+        return len(self.ids)
+
+    # Replace every template with the rows of an (N, feature_size) matrix, normalized in one step
+    def load_matrix(self, gesture_ids, matrix):
+        matrix = np.asarray(matrix, dtype=np.float32).reshape(-1, feature_size)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        self.ids = list(gesture_ids)
+        self._matrix = np.zeros((max(len(self.ids), 64), feature_size), dtype=np.float32)
+        np.divide(matrix, norms, out=self._matrix[:len(self.ids)], where=norms > 0)
+
+    # Add (or replace) a template without touching the disk
+    def add(self, gesture_id, feature_vector):
+        vector = np.asarray(feature_vector, dtype=np.float32).ravel()
+        norm = np.linalg.norm(vector)
+        if norm > 0:
+            vector = vector / norm
+
+        if gesture_id in self.ids:
+            self._matrix[self.ids.index(gesture_id)] = vector
+            return
+
+        count = len(self.ids)
+        if count == len(self._matrix):
+            # Grow the matrix by doubling so adding stays cheap
+            grown = np.zeros((2 * count, feature_size), dtype=np.float32)
+            grown[:count] = self._matrix
+            self._matrix = grown
+        self._matrix[count] = vector
+        self.ids.append(gesture_id)
+
+    def clear(self):
+        self.ids = []
+        self._matrix[:] = 0
+
+    # Return (gesture_id, similarity) of the closest template, or (None, 0) if there is none
+    def best_match(self, feature_vector):
+        if not self.ids:
+            return None, 0.0
+        vector = np.asarray(feature_vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        if norm == 0:
+            return None, 0.0
+
+        # Cosine similarity against every template at once
+        similarities = self._matrix[:len(self.ids)] @ vector
+        best = int(np.argmax(similarities))
+        return self.ids[best], float(similarities[best] / norm)
+
+    # best_match for every row of an (N, feature_size) matrix, e.g. all hands of a frame, in one product.
+    # Returns the list of gesture ids (None where there is no match) and the array of similarities.
+    def best_matches(self, feature_vectors):
+        vectors = np.asarray(feature_vectors, dtype=np.float32).reshape(-1, feature_size)
+        if not self.ids:
+            return [None] * len(vectors), np.zeros(len(vectors), dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1)
+        similarities = vectors @ self._matrix[:len(self.ids)].T
+        best = np.argmax(similarities, axis=1)
+        values = similarities[np.arange(len(vectors)), best] / np.where(norms > 0, norms, 1)
+        ids = [self.ids[b] if norm > 0 else None for b, norm in zip(best.tolist(), norms)]
+        return ids, np.where(norms > 0, values, 0.0)
+
+
+# Approximate index for large libraries (many samples per gesture, many users). The templates are
+# grouped into about sqrt(N) clusters with spherical k-means; a frame is compared with the cluster
+# centroids first and then only with the templates of the probes closest clusters. Below min_size
+# templates, or until the clusters are built, it scans everything like GestureIndex.
+class ClusterIndex(GestureIndex):
+    def __init__(self, capacity=64, probes=4, min_size=1024, iterations=8, seed=0):
+        super().__init__(capacity)
+        self.probes = probes  # Clusters searched per frame; more is slower and closer to exact
+        self.min_size = min_size
+        self.iterations = iterations
+        self.seed = seed
+        self._reset_clusters()
+
+    def _reset_clusters(self):
+        self._centroids = None  # (clusters, feature_size), normalized
+        self._assignment = np.zeros(0, dtype=np.int64)  # Cluster of every row
+        self._members = None  # Rows of every cluster, rebuilt after changes
+        self._built_size = 0
+
+    def load_matrix(self, gesture_ids, matrix):
+        super().load_matrix(gesture_ids, matrix)
+        self._reset_clusters()
+        self._build()
+
+    def add(self, gesture_id, feature_vector):
+        super().add(gesture_id, feature_vector)
+        if self._centroids is None or len(self.ids) >= 2 * self._built_size:
+            self._build()  # Rebuilt whenever the library doubles, so adding stays cheap on average
+            return
+        row = self.ids.index(gesture_id)
+        if row == len(self._assignment):
+            self._assignment = np.append(self._assignment, 0)
+        self._assignment[row] = int(np.argmax(self._centroids @ self._matrix[row]))
+        self._members = None
+
+    def clear(self):
+        super().clear()
+        self._reset_clusters()
+
+    # Spherical k-means on a sample of the templates, then every template goes to its closest centroid
+    def _build(self):
+        count = len(self.ids)
+        if count == 0 or count < self.min_size:
+            self._reset_clusters()
+            return
+        templates = self._matrix[:count]
+        rng = np.random.default_rng(self.seed)
+        clusters = max(1, int(np.sqrt(count)))
+        sample = templates[rng.choice(count, min(count, 64 * clusters), replace=False)]
+        centroids = sample[rng.choice(len(sample), clusters, replace=False)]
+        for _ in range(self.iterations):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            centroids = np.where(norms > 0, sums / np.maximum(norms, 1e-12), centroids)  # Empty clusters keep their centroid
+        self._centroids = centroids.astype(np.float32)
+        self._assignment = np.argmax(templates @ self._centroids.T, axis=1)
+        self._members = None
+        self._built_size = count
+
+    def best_match(self, feature_vector):
+        if self._centroids is None:
+            return super().best_match(feature_vector)
+        vector = np.asarray(feature_vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        if norm == 0:
+            return None, 0.0
+        if self._members is None:
+            order = np.argsort(self._assignment, kind="stable")
+            bounds = np.searchsorted(self._assignment[order], np.arange(len(self._centroids) + 1))
+            self._members = [order[bounds[c]:bounds[c + 1]] for c in range(len(self._centroids))]
+
+        # Closest clusters first, then cosine similarity against their templates only
+        probes = min(self.probes, len(self._centroids))
+        nearest = np.argpartition(self._centroids @ vector, -probes)[-probes:]
+        rows = np.concatenate([self._members[c] for c in nearest])
+        if not len(rows):
+            return None, 0.0
+        similarities = self._matrix[rows] @ vector
+        best = int(np.argmax(similarities))
+        return self.ids[rows[best]], float(similarities[best] / norm)
+
+    def best_matches(self, feature_vectors):
+        if self._centroids is None:
+            return super().best_matches(feature_vectors)
+        matches = [self.best_match(vector) for vector in np.asarray(feature_vectors, dtype=np.float32).reshape(-1, feature_size)]
+        return [gesture_id for gesture_id, _ in matches], np.array([value for _, value in matches], dtype=np.float32)
+
+
+# Similarity search backends, selected with --index
+index_backends = {
+    "exact": GestureIndex,
+    "cluster": ClusterIndex,
+}
+
+
+def create_index(backend="exact", **options):
+    return index_backends[backend](**options)
+
+
+# Synthetic library: poses random hands, then adds samples of each with small per-landmark noise,
+# which is how several recordings of one gesture differ. Returns (templates, gesture of each template).
+def synthetic_library(size, samples_per_gesture=5, noise=0.01, seed=0):
+    rng = np.random.default_rng(seed)
+    gestures = max(1, size // samples_per_gesture)
+    poses = rng.random((gestures, 21, 3)).astype(np.float32) * [0.4, 0.4, 0.1] + [0.3, 0.3, -0.05]
+    labels = np.arange(size) % gestures
+    samples = poses[labels] + rng.normal(0, noise, (size, 21, 3)).astype(np.float32)
+    return samples.transpose(0, 2, 1).reshape(size, feature_size), labels
+
+
+# Recall (how often the backend returns the exact best template) and latency per frame of every backend
+def benchmark_backends(templates, queries, backends):
+    exact = GestureIndex()
+    exact.load_matrix(range(len(templates)), templates)
+    truth = [exact.best_match(query)[0] for query in queries]
+    report = {}
+    for name, options in backends.items():
+        started = time.perf_counter()
+        index = create_index(name, **options)
+        index.load_matrix(range(len(templates)), templates)
+        build_ms = (time.perf_counter() - started) * 1000
+        times = []
+        hits = 0
+        for query, expected in zip(queries, truth):
+            started = time.perf_counter()
+            best_id, _ = index.best_match(query)
+            times.append(time.perf_counter() - started)
+            hits += best_id == expected
+        times = np.array(times) * 1e6
+        report[name] = {
+            "build_ms": build_ms,
+            "mean_us": float(times.mean()),
+            "p95_us": float(np.percentile(times, 95)),
+            "recall": hits / len(queries),
+        }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the gesture similarity backends for recall and latency")
+    parser.add_argument("--sizes", default="100,1000,10000,100000", help="Library sizes to test")
+    parser.add_argument("--library", help="Use the templates of this gesture library (gestures.npz) instead of synthetic ones")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--probes", type=int, default=4, help="Clusters searched per frame by the cluster backend")
+    args = parser.parse_args()
+
+    backends = {"exact": {}, "cluster": {"probes": args.probes, "min_size": 0}}
+    rng = np.random.default_rng(1)
+    if args.library:
+        from gesture_library import GestureLibrary
+        _, templates = GestureLibrary.load(args.library).feature_block()
+        if not len(templates):
+            print(f"{args.library} has no gestures to search")
+            return
+        datasets = [templates]
+    else:
+        datasets = [synthetic_library(int(size))[0] for size in args.sizes.split(",")]
+
+    print(f"{'templates':>10} {'backend':>8} {'build ms':>9} {'mean us':>8} {'p95 us':>8} {'recall':>7}")
+    for templates in datasets:
+        # Queries are new samples around existing templates, like a user repeating a gesture
+        picks = templates[rng.integers(0, len(templates), args.queries)]
+        queries = picks + rng.normal(0, 0.01, picks.shape).astype(np.float32)
+        for name, stats in benchmark_backends(templates, queries, backends).items():
+            print(f"{len(templates):>10} {name:>8} {stats['build_ms']:>9.1f} {stats['mean_us']:>8.1f} "
+                  f"{stats['p95_us']:>8.1f} {stats['recall']:>7.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+import os
+import json
+import hashlib
+import numpy as np
+
+from gesture_index import feature_size
+
+library_version = 1
+library_file = "gestures.npz"
+
+# Files written by older versions of advanced mode, migrated into the library on first load
+legacy_mapping_file = "gesture_key_mapping.json"
+legacy_gesture_dir = "gestures"
+
+
+# Every registered gesture of advanced mode in one file: the key of each gesture id, the static
+# templates as one contiguous float32 block and the landmark recordings of motion gestures.
+# Gesture ids are ints both in memory and on disk.
+class GestureLibrary:
+    def __init__(self):
+        self.keys = {}  # Gesture id -> key
+        self.features = {}  # Gesture id -> (feature_size,) template of a static gesture
+        self.motions = {}  # Gesture id -> (frames, 21, 3) recording of a motion gesture
+
+    def __len__(self):
+        return len(self.keys)
+
+    def next_id(self):
+        return max(self.keys, default=-1) + 1
+
+    def add(self, gesture_id, key, feature=None, motion=None):
+        self.keys[gesture_id] = key
+        if feature is not None:
+            self.features[gesture_id] = np.asarray(feature, dtype=np.float32).ravel()
+        if motion is not None:
+            self.motions[gesture_id] = np.asarray(motion, dtype=np.float32)
+
+    def clear(self):
+        self.keys.clear()
+        self.features.clear()
+        self.motions.clear()
+
+    # (ids, (N, feature_size) matrix) of all static templates
+    def feature_block(self):
+        ids = sorted(self.features)
+        matrix = np.zeros((len(ids), feature_size), dtype=np.float32)
+        for row, gesture_id in enumerate(ids):
+            matrix[row] = self.features[gesture_id]
+        return ids, matrix
+
+    # Short hash of the static templates and their keys, everything a replay of advanced mode depends on
+    def feature_digest(self):
+        ids, matrix = self.feature_block()
+        digest = hashlib.sha1()
+        digest.update(np.array(ids, dtype=np.int64).tobytes())
+        digest.update(json.dumps([self.keys[gesture_id] for gesture_id in ids]).encode())
+        digest.update(matrix.tobytes())
+        return digest.hexdigest()[:16]
+
+    # Write to a temporary file next to path and move it over the old library in one step
+    def save(self, path=library_file):
+        ids = sorted(self.keys)
+        feature_ids, features = self.feature_block()
+        motion_ids = sorted(self.motions)
+        lengths = [len(self.motions[gesture_id]) for gesture_id in motion_ids]
+        motions = np.full((len(motion_ids), max(lengths, default=0), 21, 3), np.nan, dtype=np.float32)
+        for row, gesture_id in enumerate(motion_ids):
+            motions[row, :lengths[row]] = self.motions[gesture_id]
+
+        temp_path = path + ".tmp"
+        with open(temp_path, "wb") as f:
+            np.savez(f, version=library_version,
+                     ids=np.array(ids, dtype=np.int64), keys=np.array([self.keys[i] for i in ids], dtype=str),
+                     feature_ids=np.array(feature_ids, dtype=np.int64), features=features,
+                     motion_ids=np.array(motion_ids, dtype=np.int64), motion_lengths=np.array(lengths, dtype=np.int64),
+                     motions=motions)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path=library_file):
+        library = cls()
+        with np.load(path, allow_pickle=False) as data:
+            version = int(data["version"])
+            if version > library_version:
+                raise ValueError(f"{path} is a version {version} gesture library, this program reads up to {library_version}")
+            library.keys = dict(zip(data["ids"].tolist(), data["keys"].tolist()))
+            features = data["features"]
+            library.features = dict(zip(data["feature_ids"].tolist(), features))  # Rows of one block
+            motions = data["motions"]
+            for row, (gesture_id, length) in enumerate(zip(data["motion_ids"].tolist(), data["motion_lengths"].tolist())):
+                library.motions[gesture_id] = motions[row, :length]
+        return library
+
+    # Read gesture_key_mapping.json, gesture_{id}.json and motion_{id}.npy as written by older versions
+    @classmethod
+    def from_legacy(cls, mapping_path=legacy_mapping_file, gesture_dir=legacy_gesture_dir):
+        library = cls()
+        with open(mapping_path, "r") as f:
+            mapping = json.load(f)
+        for gesture_id, key in mapping.items():
+            feature = None
+            feature_path = os.path.join(gesture_dir, f"gesture_{gesture_id}.json")
+            if os.path.exists(feature_path):
+                with open(feature_path, "r") as f:
+                    feature = json.load(f)
+            motion = None
+            motion_path = os.path.join(gesture_dir, f"motion_{gesture_id}.npy")
+            if os.path.exists(motion_path):
+                motion = np.load(motion_path)
+            library.add(int(gesture_id), key, feature, motion)
+        return library
+
+
+# The library at path; converted from the older per-gesture files when only those exist
+def open_library(path=library_file, mapping_path=legacy_mapping_file, gesture_dir=legacy_gesture_dir):
+    if os.path.exists(path):
+        return GestureLibrary.load(path)
+    if os.path.exists(mapping_path):
+        library = GestureLibrary.from_legacy(mapping_path, gesture_dir)
+        library.save(path)
+        print(f"Moved {len(library)} gestures from {mapping_path} into {path}")
+        return library
+    return GestureLibrary()
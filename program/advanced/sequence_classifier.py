@@ -0,0 +1,184 @@
+import os
+import argparse
+import numpy as np
+
+# Per-frame features: the 21 landmarks relative to the wrist and scaled by the palm size (63 values),
+# followed by the wrist position itself (3 values) so that hand motion is kept
+frame_feature_size = 66
+# Window features: mean, standard deviation and net change of the frame features
+window_feature_size = 3 * frame_feature_size
+
+
+# Frame features for any number of (..., 21, 3) landmark frames; frames without a hand stay NaN
+def frame_features(points):
+    points = np.asarray(points, dtype=np.float64)
+    wrist = points[..., :1, :]
+    relative = points - wrist
+    palm = np.linalg.norm(relative[..., 9, :], axis=-1)[..., None, None]  # Wrist to middle finger base
+    relative = relative / np.where(palm > 0, palm, 1.0)
+    shape = points.shape[:-2]
+    return np.concatenate([relative.reshape(shape + (63,)), wrist.reshape(shape + (3,))], axis=-1)
+
+
+# Window features for (N, window, frame_feature_size) frame features, ignoring frames without a hand.
+# Also returns how many frames of each window had a hand.
+def window_features(features):
+    valid = ~np.isnan(features[..., 0])
+    counts = valid.sum(axis=1)
+    safe = np.where(valid[..., None], features, 0.0)
+    n = np.maximum(counts, 1)[:, None]
+    mean = safe.sum(axis=1) / n
+    variance = np.maximum((safe ** 2).sum(axis=1) / n - mean ** 2, 0.0)
+
+    rows = np.arange(len(features))
+    first = valid.argmax(axis=1)
+    last = features.shape[1] - 1 - valid[:, ::-1].argmax(axis=1)
+    change = safe[rows, last] - safe[rows, first]
+    return np.concatenate([mean, np.sqrt(variance), change], axis=1), counts
+
+
+# A softmax classifier over standardized window features
+class SequenceModel:
+    def __init__(self, window, feature_mean, feature_scale, weights, bias):
+        self.window = window
+        self.feature_mean = feature_mean
+        self.feature_scale = feature_scale
+        self.weights = weights  # (window_feature_size, actions)
+        self.bias = bias
+
+    @property
+    def actions(self):
+        return len(self.bias)
+
+    def probabilities(self, features):
+        scores = ((features - self.feature_mean) / self.feature_scale) @ self.weights + self.bias
+        scores = scores - scores.max(axis=-1, keepdims=True)
+        exp_scores = np.exp(scores)
+        return exp_scores / exp_scores.sum(axis=-1, keepdims=True)
+
+    def save(self, path):
+        np.savez(path, window=self.window, feature_mean=self.feature_mean, feature_scale=self.feature_scale,
+                 weights=self.weights, bias=self.bias)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(int(data["window"]), data["feature_mean"], data["feature_scale"], data["weights"], data["bias"])
+
+
+# Cut every (action, sequence, frame, 21, 3) recording into windows; returns features, labels and sequence ids
+def training_windows(dataset, window, stride):
+    actions, sequences, length = dataset.shape[:3]
+    features = frame_features(dataset)
+    starts = range(0, length - window + 1, stride)
+    windows = np.stack([features[:, :, start:start + window] for start in starts], axis=2)
+    windows = windows.reshape(-1, window, frame_feature_size)
+    labels = np.repeat(np.arange(actions), sequences * len(starts))
+    sequence_ids = np.tile(np.repeat(np.arange(sequences), len(starts)), actions)
+    return windows, labels, sequence_ids
+
+
+def train(dataset, window=20, stride=2, epochs=500, learning_rate=0.5, l2=1e-3, holdout=5):
+    windows, labels, sequence_ids = training_windows(dataset, window, stride)
+    features, counts = window_features(windows)
+    keep = counts >= window // 2  # Skip windows where the hand was mostly missing
+    features, labels, sequence_ids = features[keep], labels[keep], sequence_ids[keep]
+
+    # Every holdout-th recorded sequence is kept apart to measure accuracy
+    test = sequence_ids % holdout == holdout - 1 if holdout else np.zeros(len(labels), dtype=bool)
+    train_features, train_labels = features[~test], labels[~test]
+
+    feature_mean = train_features.mean(axis=0)
+    feature_scale = train_features.std(axis=0) + 1e-6
+    x = (train_features - feature_mean) / feature_scale
+    targets = np.eye(dataset.shape[0])[train_labels]
+
+    model = SequenceModel(window, feature_mean, feature_scale,
+                          np.zeros((window_feature_size, dataset.shape[0])), np.zeros(dataset.shape[0]))
+    for _ in range(epochs):
+        error = model.probabilities(train_features) - targets
+        model.weights -= learning_rate * (x.T @ error / len(x) + l2 * model.weights)
+        model.bias -= learning_rate * error.mean(axis=0)
+
+    accuracy = None
+    if test.any():
+        accuracy = float((model.probabilities(features[test]).argmax(axis=1) == labels[test]).mean())
+    return model, accuracy
+
+
+# Classifies the most recent window of frames at runtime. Frames go into a ring buffer and the
+# feature sums are updated with the newest frame and the one that drops out, instead of
+# recomputing the whole window on every frame.
+class SlidingWindowClassifier:
+    def __init__(self, model, min_probability=0.6):
+        self.model = model
+        self.min_probability = min_probability
+        self.window = model.window
+        self._frames = np.full((self.window, frame_feature_size), np.nan)
+        self._position = 0  # Where the next frame goes, which is also the oldest frame
+        self._sum = np.zeros(frame_feature_size)
+        self._square_sum = np.zeros(frame_feature_size)
+        self._count = 0
+        self._features = np.zeros(window_feature_size)
+
+    def reset(self):
+        self._frames[:] = np.nan
+        self._sum[:] = 0
+        self._square_sum[:] = 0
+        self._count = 0
+
+    # Add one (21, 3) landmark frame (NaN without a hand); returns (action, probability) or None
+    def update(self, points):
+        features = frame_features(points)
+        oldest = self._frames[self._position]
+        if not np.isnan(oldest[0]):
+            self._sum -= oldest
+            self._square_sum -= oldest ** 2
+            self._count -= 1
+        if not np.isnan(features[0]):
+            self._sum += features
+            self._square_sum += features ** 2
+            self._count += 1
+        self._frames[self._position] = features
+        self._position = (self._position + 1) % self.window
+
+        if self._count < self.window // 2:
+            return None
+
+        f = frame_feature_size
+        mean = self._features[:f]
+        np.divide(self._sum, self._count, out=mean)
+        np.sqrt(np.maximum(self._square_sum / self._count - mean ** 2, 0.0), out=self._features[f:2 * f])
+
+        # Net change between the oldest and newest frames that had a hand
+        order = np.roll(np.arange(self.window), -self._position)
+        valid = order[~np.isnan(self._frames[order, 0])]
+        np.subtract(self._frames[valid[-1]], self._frames[valid[0]], out=self._features[2 * f:])
+
+        probabilities = self.model.probabilities(self._features)
+        action = int(probabilities.argmax())
+        if probabilities[action] < self.min_probability:
+            return None
+        return action, float(probabilities[action])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the sliding-window action classifier on collected landmarks")
+    parser.add_argument('--data', default=os.path.join('.data', 'landmarks.npy'),
+                        help='(action, sequence, frame, 21, 3) landmark file from action.py or extract_landmarks.py')
+    parser.add_argument('--output', default=os.path.join('.data', 'sequence_model.npz'))
+    parser.add_argument('--window', type=int, default=20, help='Frames per classified window')
+    parser.add_argument('--stride', type=int, default=2, help='Frames between training windows')
+    parser.add_argument('--epochs', type=int, default=500)
+    args = parser.parse_args()
+
+    dataset = np.load(args.data, mmap_mode='r')
+    model, accuracy = train(dataset, window=args.window, stride=args.stride, epochs=args.epochs)
+    model.save(args.output)
+    if accuracy is not None:
+        print(f'Held-out accuracy: {accuracy:.3f}')
+    print(f'Saved {model.actions}-action model with a {model.window}-frame window to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
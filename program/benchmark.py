@@ -0,0 +1,187 @@
+import os
+import sys
+import json
+import time
+import argparse
+import numpy as np
+import cv2
+
+program_dir = os.path.dirname(os.path.abspath(__file__))
+for mode_dir in ("classic", "driving", "advanced"):
+    sys.path.append(os.path.join(program_dir, mode_dir))
+
+from framesource import open_source
+from handtracker import HandTracker
+from gesture_index import index_backends
+
+# Stages of one frame, in pipeline order
+stage_names = ("capture", "color", "inference", "classify", "actuate", "render")
+
+
+# Collects how long every stage of every frame took
+class StageTimer:
+    def __init__(self):
+        self.samples = {name: [] for name in stage_names}
+        self._last = 0.0
+
+    def start(self):
+        self._last = time.perf_counter()
+
+    # Record the time spent since the previous lap under the given stage
+    def lap(self, stage):
+        now = time.perf_counter()
+        self.samples[stage].append(now - self._last)
+        self._last = now
+
+    def summary(self):
+        stats = {}
+        for name, values in self.samples.items():
+            if values:
+                ms = np.array(values) * 1000
+                stats[name] = {
+                    "mean_ms": float(ms.mean()),
+                    "p50_ms": float(np.percentile(ms, 50)),
+                    "p95_ms": float(np.percentile(ms, 95)),
+                    "max_ms": float(ms.max()),
+                }
+        return stats
+
+
+# Hand landmarks of a BGR frame, through the tracker unless --full-frame was given
+def detect_hands(hands, tracker, frame, timer):
+    if tracker is not None:
+        results = tracker.process(frame)  # Color conversion happens on the crop, inside the tracker
+    else:
+        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        timer.lap("color")
+        results = hands.process(rgb_frame)
+    timer.lap("inference")
+    return results
+
+
+# The mode's interpreter, carrying out nothing: classic and advanced have no actuator, so their actions are
+# only counted, and driving records its key transitions instead of injecting them
+def create_interpreter(mode, args):
+    if mode == "classic":
+        from classic_mode import ClassicInterpreter
+        return ClassicInterpreter(args.max_hands)
+    if mode == "driving":
+        from driving_mode import DrivingInterpreter, keyinput
+        return DrivingInterpreter(keyinput.KeyState(keyinput.RecordingBackend()))
+
+    from advanced_interpreter import AdvancedInterpreter
+    from gesture_library import GestureLibrary
+    if os.path.exists(args.gestures):
+        library = GestureLibrary.load(args.gestures)
+    else:
+        # No saved gestures, score against random templates so matching still costs what it would
+        rng = np.random.default_rng(0)
+        library = GestureLibrary()
+        for gesture_id in range(args.templates):
+            library.add(gesture_id, "A", feature=rng.random(63))
+    return AdvancedInterpreter(library, index=args.index, max_hands=args.max_hands)
+
+
+# One mode with the hand model settings of its interpreter
+class Pipeline:
+    def __init__(self, mode, args):
+        self.interpreter = interpreter = create_interpreter(mode, args)
+        self.hands = interpreter.create_hands(interpreter.max_hands)
+        self.tracker = None if args.full_frame else HandTracker(
+            self.hands, track_hands=interpreter.track_hands, max_hands=interpreter.max_hands,
+            search_hands=interpreter.create_hands(interpreter.max_hands, static_image_mode=True))
+        self.actions = []
+
+    def process(self, frame, timer):
+        interpreter = self.interpreter
+        now = time.perf_counter()
+        if interpreter.mirror:
+            frame = cv2.flip(frame, 1)
+        h, w, _ = frame.shape
+        results = detect_hands(self.hands, self.tracker, frame, timer)
+
+        actions = interpreter.update(results, w, h, now)
+        timer.lap("classify")
+
+        self.actions.extend(interpreter.actuate(actions, now))
+        timer.lap("actuate")
+
+        interpreter.draw(frame)
+        timer.lap("render")
+
+
+modes = ("classic", "driving", "advanced")
+
+
+# Replay the source through one mode and return its timings
+def run_benchmark(mode, args):
+    pipeline = Pipeline(mode, args)
+    cap = open_source(args.source)
+    timer = StageTimer()
+
+    frames = 0
+    start_time = time.perf_counter()
+    while args.frames == 0 or frames < args.frames:
+        timer.start()
+        ret, frame = cap.read()
+        if not ret:
+            break
+        timer.lap("capture")
+        pipeline.process(frame, timer)
+        frames += 1
+    elapsed = time.perf_counter() - start_time
+    cap.release()
+
+    report = {
+        "mode": mode,
+        "source": str(args.source),
+        "frames": frames,
+        "fps": frames / elapsed if elapsed > 0 else 0.0,
+        "actions": len(pipeline.actions),
+        "stages": timer.summary(),
+    }
+    if pipeline.tracker is not None:
+        report["tracking"] = pipeline.tracker.stats()
+    return report
+
+
+def print_report(report):
+    print(f"\n{report['mode']} mode: {report['frames']} frames from {report['source']}, "
+          f"{report['fps']:.1f} FPS, {report['actions']} actions")
+    print(f"  {'stage':<10}{'mean':>9}{'p50':>9}{'p95':>9}{'max':>9}  (ms)")
+    for name in stage_names:
+        stats = report["stages"].get(name)
+        if stats:
+            print(f"  {name:<10}{stats['mean_ms']:>9.2f}{stats['p50_ms']:>9.2f}{stats['p95_ms']:>9.2f}{stats['max_ms']:>9.2f}")
+    tracking = report.get("tracking")
+    if tracking:
+        print(f"  hand tracked in a crop on {tracking['tracked_ratio']:.0%} of frames, lost {tracking['lost']} times")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded frames through the gesture modes and time every stage")
+    parser.add_argument("source", help="Video file, image directory or webcam index")
+    parser.add_argument("--mode", choices=list(modes) + ["all"], default="all")
+    parser.add_argument("--frames", type=int, default=0, help="Stop after this many frames (0 = whole source)")
+    parser.add_argument("--gestures", default="gestures.npz", help="Advanced mode gesture library")
+    parser.add_argument("--templates", type=int, default=40, help="Random templates used when no gestures are saved")
+    parser.add_argument("--index", choices=list(index_backends), default="exact", help="Advanced mode similarity search backend")
+    parser.add_argument("--max-hands", type=int, default=1, help="Hands classic and advanced mode look for")
+    parser.add_argument("--full-frame", action="store_true", help="Run MediaPipe on the whole frame instead of tracking the hand")
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    selected = list(modes) if args.mode == "all" else [args.mode]
+    reports = []
+    for mode in selected:
+        report = run_benchmark(mode, args)
+        print_report(report)
+        reports.append(report)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(reports, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+import threading
+import time
+
+
+# Reads frames from a capture device on its own thread and only ever keeps the newest one.
+# A slow consumer gets the latest frame instead of working through a backlog of stale ones,
+# and every frame that was replaced before anyone read it is counted as dropped.
+class LatestFrameCapture:
+    def __init__(self, cap, retry_delay=0.005):
+        self.cap = cap
+        self.retry_delay = retry_delay  # Pause after a failed read before trying again
+        self.frames_read = 0
+        self.frames_dropped = 0
+        self.frame_time = 0.0  # time.perf_counter() when the frame last returned by read() arrived
+        self._frame = None
+        self._frame_time = 0.0
+        self._frame_number = 0  # Number of the newest frame
+        self._taken_number = 0  # Number of the last frame handed to the consumer
+        self._running = False
+        self._thread = None
+        self._condition = threading.Condition()
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while self._running:
+            ret, frame = self.cap.read()
+            if not ret:
+                if not self.cap.isOpened():
+                    break
+                time.sleep(self.retry_delay)
+                continue
+
+            with self._condition:
+                if self._frame_number > self._taken_number:
+                    self.frames_dropped += 1  # The previous frame was never read
+                self._frame = frame
+                self._frame_time = time.perf_counter()
+                self._frame_number += 1
+                self.frames_read += 1
+                self._condition.notify_all()
+
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+
+    # Same interface as cv2.VideoCapture.read(): waits for a frame newer than the last one returned
+    def read(self, timeout=1.0):
+        with self._condition:
+            self._condition.wait_for(lambda: self._frame_number > self._taken_number or not self._running, timeout)
+            if self._frame_number == self._taken_number:
+                return False, None
+            self._taken_number = self._frame_number
+            self.frame_time = self._frame_time
+            return True, self._frame
+
+    def isOpened(self):
+        return self._running
+
+    def release(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join()
+        self.cap.release()
@@ -1,15 +1,25 @@
+import os
+import sys
+import time
+import argparse
 import cv2
 import mediapipe as mp
-import pyautogui
 import numpy as np
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from actuation import ActuationWorker, ModeAction
+from capture import LatestFrameCapture
+from framesource import open_source, is_live_source
+from handtracker import HandTracker
+from handtracks import HandTracks
+from scheduler import IdleScheduler
+from sharedlandmarks import LandmarkReader, default_name
+from metrics import add_metrics_arguments, create_metrics, draw_overlay
+from landmarktrace import TraceWriter
+
 # Initialize Mediapipe hand tracking
 mp_hands = mp.solutions.hands
 mp_drawing = mp.solutions.drawing_utils
-hands = mp_hands.Hands(max_num_hands=1, min_detection_confidence=0.7)
-
-# Capture video feed
-cap = cv2.VideoCapture(0)
 
 # Define gesture descriptions
 gesture_descriptions = {
@@ -20,84 +30,273 @@ gesture_descriptions = {
     "unknown": "Unknown: Gesture not recognized."
 }
 
-# Helper function to recognize gestures
-def recognize_gesture(landmarks):
-    thumb_tip = landmarks[4]      # Thumb tip
-    index_tip = landmarks[8]      # Index finger tip
-    middle_tip = landmarks[12]    # Middle finger tip
-    ring_tip = landmarks[16]      # Ring finger tip
-
-    # Calculate distances for gesture recognition
-    thumb_index_dist = np.linalg.norm(np.array([thumb_tip.x, thumb_tip.y]) - np.array([index_tip.x, index_tip.y]))
-    thumb_middle_dist = np.linalg.norm(np.array([thumb_tip.x, thumb_tip.y]) - np.array([middle_tip.x, middle_tip.y]))
-    thumb_ring_dist = np.linalg.norm(np.array([thumb_tip.x, thumb_tip.y]) - np.array([ring_tip.x, ring_tip.y]))
-
-    # Define gesture thresholds
-    if thumb_index_dist < 0.05:
-        return "click"
-    elif thumb_middle_dist < 0.05:
-        return "volume_up"
-    elif thumb_ring_dist < 0.05:
-        return "volume_down"
-    elif thumb_index_dist > 0.2:
-        return "move_cursor"
-    else:
+def create_hands(max_hands=1, static_image_mode=False):
+    return mp_hands.Hands(static_image_mode=static_image_mode, max_num_hands=max_hands, min_detection_confidence=0.7)
+
+# Gesture names in the order of the codes returned by GestureRecognizer.recognize
+gesture_names = tuple(gesture_descriptions)
+
+fingertips = slice(4, 21, 4)  # Thumb, index, middle, ring and pinky tips (landmarks 4, 8, 12, 16, 20)
+touch_threshold = 0.05  # Thumb and fingertip closer than this are touching
+spread_threshold = 0.2  # Thumb and index further apart than this point the cursor
+
+# Classifies any number of hands (or recorded frames) from their (N, 21, 3) landmarks at once.
+# Every step writes into buffers that are allocated once and only grown when more hands show up.
+class GestureRecognizer:
+    def __init__(self, size=2):
+        self._allocate(size)
+
+    def _allocate(self, size):
+        self._differences = np.zeros((size, 3, 2), dtype=np.float32)
+        self._distances = np.zeros((size, 3), dtype=np.float32)
+        self._mask = np.zeros(size, dtype=bool)
+        self._codes = np.zeros(size, dtype=np.intp)
+
+    # Codes into gesture_names, one per row of points; overwritten by the next call
+    def recognize(self, points):
+        n = len(points)
+        if n > len(self._codes):
+            self._allocate(n)
+        tips = points[:, fingertips, :2]
+        differences, distances = self._differences[:n], self._distances[:n]
+        mask, codes = self._mask[:n], self._codes[:n]
+        np.subtract(tips[:, 1:4], tips[:, :1], out=differences)  # Index, middle and ring tip relative to the thumb tip
+        np.hypot(differences[..., 0], differences[..., 1], out=distances)
+
+        # Apply the rules from last to first, so the first rule that holds decides
+        codes.fill(4)
+        np.greater(distances[:, 0], spread_threshold, out=mask)  # Thumb and index spread: move the cursor
+        np.copyto(codes, 3, where=mask)
+        for code in (2, 1, 0):  # Thumb touching the ring, middle or index finger
+            np.less(distances[:, code], touch_threshold, out=mask)
+            np.copyto(codes, code, where=mask)
+        return codes
+
+# Map a recognized gesture to the pyautogui call it triggers, as (function name, arguments)
+def gesture_action(gesture, landmarks, w, h):
+    if gesture == "click":
+        return "click", ()
+    elif gesture == "volume_up":
+        return "press", ("volumeup",)
+    elif gesture == "volume_down":
+        return "press", ("volumedown",)
+    elif gesture == "move_cursor":
+        # Move cursor based on index finger position
+        index_finger = landmarks[8]
+        cursor_x = int(index_finger.x * w)
+        cursor_y = int(index_finger.y * h)
+        return "moveTo", (cursor_x, cursor_y)
+    return None
+
+# The gesture shown in the description panel: the one of the hand that has been in view longest
+def panel_gesture(hands):
+    if not hands:
         return "unknown"
+    return min(hands, key=lambda hand: hand.track_id).state["gesture"]
+
+# Write the track ID, handedness and gesture of a hand next to its wrist
+def draw_hand_label(frame, hand):
+    h, w = frame.shape[:2]
+    wrist = hand.points[0]
+    cv2.putText(frame, f"{hand.label()}: {hand.state['gesture']}", (int(wrist[0] * w) - 40, int(wrist[1] * h) + 25),
+                cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 255), 1)
+
+# Keeps the camera frame and the gesture descriptions side by side in one reused image.
+# The description panel is drawn once; a frame only copies the camera image in and,
+# when the recognized gesture changes, redraws the two affected lines.
+class DescriptionPanel:
+    width = 400
+
+    def __init__(self):
+        self.output = None
+        self.highlighted = None
+
+    def _line_position(self, gesture):
+        i = list(gesture_descriptions).index(gesture)
+        return (10, 70 + i * 30)
+
+    def _draw_line(self, gesture, color):
+        x0 = self.output.shape[1] - self.width
+        x, y = self._line_position(gesture)
+        self.output[y - 20:y + 10, x0:] = 0  # Clear the line before drawing over it
+        cv2.putText(self.output, gesture_descriptions[gesture], (x0 + x, y), cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 1)
+
+    def _build(self, h, w):
+        self.output = np.zeros((h, w + self.width, 3), dtype=np.uint8)
+        cv2.putText(self.output, "Gesture Descriptions:", (w + 10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
+        for gesture in gesture_descriptions:
+            self._draw_line(gesture, (255, 255, 255))
+        self.highlighted = None
+
+    # Return the combined image: left (camera) and right (descriptions)
+    def compose(self, frame, recognized_gesture):
+        h, w = frame.shape[:2]
+        if self.output is None or self.output.shape[0] != h or self.output.shape[1] != w + self.width:
+            self._build(h, w)
+
+        # Show the recognized gesture description
+        if recognized_gesture != self.highlighted:
+            if self.highlighted is not None:
+                self._draw_line(self.highlighted, (255, 255, 255))
+            self._draw_line(recognized_gesture, (0, 255, 0))
+            self.highlighted = recognized_gesture
+
+        self.output[:, :w] = frame
+        return self.output
 
-# Loop for video feed and gesture recognition
-while True:
-    ret, frame = cap.read()
-    frame = cv2.flip(frame, 1)  # Mirror the frame
-    h, w, _ = frame.shape  # Dimensions of the frame
-
-    # Convert the frame to RGB for Mediapipe processing
-    rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-    results = hands.process(rgb_frame)
-
-    # Check for detected hands and landmarks
-    recognized_gesture = "unknown"  # Default gesture
-    if results.multi_hand_landmarks:
-        for hand_landmarks in results.multi_hand_landmarks:
-            # Draw hand landmarks on the frame
-            mp_drawing.draw_landmarks(frame, hand_landmarks, mp_hands.HAND_CONNECTIONS)
-            
-            # Extract landmark coordinates
-            landmarks = hand_landmarks.landmark
-            recognized_gesture = recognize_gesture(landmarks)
+# Classic mode one frame at a time, for this script, the launcher, replay.py, benchmark.py and
+# multicamera.py: every hand is followed with its own track, all of them are classified at once and the
+# gesture of each hand becomes its pyautogui call
+class ClassicInterpreter:
+    create_hands = staticmethod(create_hands)
+    max_hands = 1
+    track_hands = 1  # Hands that keep the tracker on its crop
+    idle_after = 30
+    mirror = True  # Landmarks are found on the mirrored frame
+
+    def __init__(self, max_hands=1, actuator=None):
+        self.max_hands = max_hands
+        self.actuator = actuator  # ActuationWorker for the calls; None only decides them, e.g. in a replay
+        self.tracks = HandTracks()  # Track ID, handedness and gesture of every hand in view
+        self.recognizer = GestureRecognizer()
+        self.panel = DescriptionPanel()
+        self.hands = []  # Tracks of the hands of the last frame
+
+    # Classify the hands of a frame of w x h pixels; returns the actions of their gestures
+    def update(self, results, w, h, now):
+        hands = self.tracks.update(results)
+        actions = []
+        for hand, code in zip(hands, self.recognizer.recognize(self.tracks.points).tolist()):
+            held = hand.state.get("gesture") == gesture_names[code]
+            hand.state["gesture"] = gesture_names[code]
+            action = gesture_action(hand.state["gesture"], hand.landmarks.landmark, w, h)
+            if action is not None:
+                name, action_args = action
+                actions.append(ModeAction("gesture", name, tuple(action_args), hand, hand.state["gesture"], held))
+        self.hands = hands
+        return actions
+
+    # Send the actions to the actuator; returns the actions that were carried out
+    def actuate(self, actions, now):
+        if self.actuator is not None:
+            for action in actions:
+                self.actuator.submit(action.name, *action.args, origin=now)
+        return actions
+
+    # Draw the hands of the last frame on it; returns the frame next to the gesture descriptions
+    def draw(self, frame):
+        for hand in self.hands:
+            mp_drawing.draw_landmarks(frame, hand.landmarks, mp_hands.HAND_CONNECTIONS)
+            draw_hand_label(frame, hand)
+        return self.panel.compose(frame, panel_gesture(self.hands))
+
+    def close(self):
+        pass
+
+def main():
+    parser = argparse.ArgumentParser(description="Classic gesture mode")
+    parser.add_argument("--source", default="0", help="Webcam index, video file or image directory")
+    parser.add_argument("--headless", action="store_true", help="Skip drawing and the preview window")
+    parser.add_argument("--idle-after", type=int, default=30, help="Frames without a hand before detection slows down (0 = never)")
+    parser.add_argument("--idle-fps", type=float, default=3.0, help="Detection rate while no hand is in view")
+    parser.add_argument("--max-hands", type=int, default=1, help="Hands followed at once, e.g. several users in front of one screen")
+    parser.add_argument("--attach", nargs="?", const=default_name, help="Use frames and landmarks from sharedlandmarks.py instead of the camera")
+    parser.add_argument("--record", help="Record the landmarks and actions of this session to a trace file for replay.py")
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+
+    recorder = TraceWriter(args.record, "classic", max_hands=args.max_hands) if args.record else None
+    metrics = create_metrics("classic", args)
+    timer = metrics.timer()
+    actuator = ActuationWorker(on_executed=metrics.actuated).start()  # pyautogui calls run on their own thread
+    interpreter = ClassicInterpreter(args.max_hands, actuator)
+
+    if args.attach:
+        # The daemon owns the camera and the model, the reader stands in for both
+        cap = scheduler = LandmarkReader(args.attach, mirror=True)
+        live = True
+    else:
+        tracker = HandTracker(create_hands(args.max_hands), max_hands=args.max_hands,  # MediaPipe only sees a crop around the hands once they are found
+                              search_hands=create_hands(args.max_hands, static_image_mode=True))
+        scheduler = IdleScheduler(tracker, idle_after=args.idle_after, idle_fps=args.idle_fps)
+
+        # Capture video feed; a live camera is read on a background thread, always working on the newest frame
+        live = is_live_source(args.source)
+        cap = open_source(args.source)
+        if live:
+            cap = LatestFrameCapture(cap).start()
+
+    # Loop for video feed and gesture recognition
+    try:
+        while True:
+            timer.start()
+            ret, frame = cap.read()
+            if not ret:
+                if live and cap.isOpened():
+                    continue
+                break  # End of the recording
+            frame_time = cap.frame_time if live else time.perf_counter()
+            timer.lap("capture")
+            metrics.frame()
+            if live:
+                metrics.set_dropped("camera", cap.frames_dropped)
+            frame = cv2.flip(frame, 1)  # Mirror the frame
+            if args.attach and not cap.is_current():
+                continue  # The daemon rewrote the shared slot while it was mirrored
+            h, w, _ = frame.shape  # Dimensions of the frame
+
+            # Mediapipe processing, on the region around the hand of the previous frame
+            results = scheduler.process(frame)
+            timer.lap("inference")
+            if recorder is not None:
+                recorder.add_frame(frame_time, results, frame.shape)
+
+            # Follow every hand with its own track and classify all of them at once
+            actions = interpreter.update(results, w, h, frame_time)
+            timer.lap("classify")
 
             # Gesture-based actions
-            if recognized_gesture == "click":
-                pyautogui.click()
-            elif recognized_gesture == "volume_up":
-                pyautogui.press("volumeup")
-            elif recognized_gesture == "volume_down":
-                pyautogui.press("volumedown")
-            elif recognized_gesture == "move_cursor":
-                # Move cursor based on index finger position
-                index_finger = landmarks[8]
-                cursor_x = int(index_finger.x * w)
-                cursor_y = int(index_finger.y * h)
-                pyautogui.moveTo(cursor_x, cursor_y)
-
-    # Prepare to display gesture descriptions on the right side
-    right_frame = np.zeros((h, 400, 3), dtype=np.uint8)  # Create a blank image for descriptions
-    cv2.putText(right_frame, "Gesture Descriptions:", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
-    
-    # Show the recognized gesture description
-    for i, (gesture, description) in enumerate(gesture_descriptions.items()):
-        color = (0, 255, 0) if gesture == recognized_gesture else (255, 255, 255)
-        cv2.putText(right_frame, description, (10, 70 + i * 30), cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 1)
-
-    # Combine frames: left (camera) and right (descriptions)
-    combined_frame = np.hstack((frame, right_frame))
-
-    # Show combined output
-    cv2.imshow("Hand Gesture Recognition", combined_frame)
-
-    # Exit loop on 'q' key press
-    if cv2.waitKey(1) & 0xFF == ord('q'):
-        break
-
-# Cleanup
-cap.release()
-cv2.destroyAllWindows()
\ No newline at end of file
+            for action in interpreter.actuate(actions, frame_time):
+                if recorder is not None:
+                    recorder.add_action(action.source, action.name, *action.args)
+            timer.lap("actuate")
+
+            if args.headless:
+                continue
+
+            # Draw hand landmarks on the frame, next to the gesture descriptions
+            output = interpreter.draw(frame)
+            cv2.putText(output, f"Detection: {scheduler.status()}", (10, h - 15), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 255), 1)
+            if args.overlay:
+                draw_overlay(output, metrics)
+
+            # Show combined output
+            cv2.imshow("Hand Gesture Recognition", output)
+
+            # Exit loop on 'q' key press
+            if cv2.waitKey(1) & 0xFF == ord('q'):
+                break
+            timer.lap("render")
+    except KeyboardInterrupt:
+        pass  # Headless runs are stopped with Ctrl+C
+
+    # Cleanup
+    actuator.stop()
+    if recorder is not None:
+        recorder.close()
+    stats = actuator.stats()
+    print(f"Actions: {stats['executed']} run, {stats['coalesced']} merged, {stats['dropped']} dropped, {stats['failed']} failed, "
+          f"lag {stats['mean_lag_ms']:.0f} ms mean / {stats['max_lag_ms']:.0f} ms max")
+    if not args.attach:
+        idle = scheduler.stats()
+        print(f"Detection skipped on {idle['skipped']} frames while idle, woke up {idle['wakeups']} times")
+        tracking = tracker.stats()
+        print(f"Hand tracked in a crop on {tracking['tracked_ratio']:.0%} of frames, lost {tracking['lost']} times")
+    if live:
+        print(f"Dropped {cap.frames_dropped} of {cap.frames_read} camera frames")
+    cap.release()
+    if not args.headless:
+        cv2.destroyAllWindows()
+
+if __name__ == "__main__":
+    main()
@@ -1,142 +1,225 @@
-import math
+import os
+import sys
+import time
+import argparse
+from contextlib import nullcontext
 import keyinput
+from steering import SteeringEngine, check_steering_range
 import cv2
 import mediapipe as mp
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from capture import LatestFrameCapture
+from framesource import open_source, is_live_source
+from handtracker import HandTracker
+from scheduler import IdleScheduler
+from sharedlandmarks import LandmarkReader, default_name
+from metrics import add_metrics_arguments, create_metrics, draw_overlay
+from landmarktrace import TraceWriter
+from actuation import ModeAction
 mp_drawing = mp.solutions.drawing_utils
 mp_drawing_styles = mp.solutions.drawing_styles
 mp_hands = mp.solutions.hands
 font = cv2.FONT_HERSHEY_SIMPLEX
-# 0 For webcam input:
-cap = cv2.VideoCapture(0)
-
-with mp_hands.Hands(
-    model_complexity=0,
-    min_detection_confidence=0.5,
-    min_tracking_confidence=0.5) as hands:
-  while cap.isOpened():
-    success, image = cap.read()
-    if not success:
-      print("Ignoring empty camera frame.")
-      # If loading a video, use 'break' instead of 'continue'.
-      continue
-
-    # To improve performance, optionally mark the image as not writeable to
-    image.flags.writeable = False
-    image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-    results = hands.process(image)
-    imageHeight, imageWidth, _ = image.shape
-
-    # Draw the hand annotations on the image.
-    image.flags.writeable = True
-    image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
-    co=[]
+
+# For each direction: keys to release, key to press, message and label drawn on the frame
+steering_actions = {
+    "left": (("s", "d"), "a", "Turn left.", "Turn left"),
+    "right": (("s", "a"), "d", "Turn right.", "Turn right"),
+    "straight": (("s", "a", "d"), "w", "keeping straight", "keep straight"),
+    "back": (("a", "d", "w"), "s", "keeping back", "keeping back"),
+}
+
+def create_hands(max_hands=2, static_image_mode=False):
+    return mp_hands.Hands(
+        static_image_mode=static_image_mode,
+        max_num_hands=max_hands,
+        model_complexity=0,
+        min_detection_confidence=0.5,
+        min_tracking_confidence=0.5)
+
+# Pixel coordinates of the wrist of every detected hand
+def wrist_points(results, imageWidth, imageHeight):
+    co = []
     if results.multi_hand_landmarks:
       for hand_landmarks in results.multi_hand_landmarks:
-        mp_drawing.draw_landmarks(
-            image,
-            hand_landmarks,
-            mp_hands.HAND_CONNECTIONS,
-            mp_drawing_styles.get_default_hand_landmarks_style(),
-            mp_drawing_styles.get_default_hand_connections_style())
-        for point in mp_hands.HandLandmark:
-           if str(point) == "HandLandmark.WRIST":
-              normalizedLandmark = hand_landmarks.landmark[point]
-              pixelCoordinatesLandmark = mp_drawing._normalized_to_pixel_coordinates(normalizedLandmark.x, normalizedLandmark.y, imageWidth, imageHeight)
-
-              try:
-                co.append(list(pixelCoordinatesLandmark))
-              except:
-                  continue
-
-    if len(co) == 2:
-        xm, ym = (co[0][0] + co[1][0]) / 2, (co[0][1] + co[1][1]) / 2
-        radius = 150
-        try:
-            m=(co[1][1]-co[0][1])/(co[1][0]-co[0][0])
-        except:
-            continue
-        a = 1 + m ** 2
-        b = -2 * xm - 2 * co[0][0] * (m ** 2) + 2 * m * co[0][1] - 2 * m * ym
-        c = xm ** 2 + (m ** 2) * (co[0][0] ** 2) + co[0][1] ** 2 + ym ** 2 - 2 * co[0][1] * ym - 2 * co[0][1] * co[0][
-            0] * m + 2 * m * ym * co[0][0] - 22500
-        xa = (-b + (b ** 2 - 4 * a * c) ** 0.5) / (2 * a)
-        xb = (-b - (b ** 2 - 4 * a * c) ** 0.5) / (2 * a)
-        ya = m * (xa - co[0][0]) + co[0][1]
-        yb = m * (xb - co[0][0]) + co[0][1]
-        if m!=0:
-          ap = 1 + ((-1/m) ** 2)
-          bp = -2 * xm - 2 * xm * ((-1/m) ** 2) + 2 * (-1/m) * ym - 2 * (-1/m) * ym
-          cp = xm ** 2 + ((-1/m) ** 2) * (xm ** 2) + ym ** 2 + ym ** 2 - 2 * ym * ym - 2 * ym * xm * (-1/m) + 2 * (-1/m) * ym * xm - 22500
-          try:
-           xap = (-bp + (bp ** 2 - 4 * ap * cp) ** 0.5) / (2 * ap)
-           xbp = (-bp - (bp ** 2 - 4 * ap * cp) ** 0.5) / (2 * ap)
-           yap = (-1 / m) * (xap - xm) + ym
-           ybp = (-1 / m) * (xbp - xm) + ym
-
-          except:
-              continue
-
-        cv2.circle(img=image, center=(int(xm), int(ym)), radius=radius, color=(195, 255, 62), thickness=15)
-
-        l = (int(math.sqrt((co[0][0] - co[1][0]) ** 2 * (co[0][1] - co[1][1]) ** 2)) - 150) // 2
-        cv2.line(image, (int(xa), int(ya)), (int(xb), int(yb)), (195, 255, 62), 20)
-        if co[0][0] > co[1][0] and co[0][1]>co[1][1] and co[0][1] - co[1][1] > 65:
-            print("Turn left.")
-            keyinput.release_key('s')
-            keyinput.release_key('d')
-            keyinput.press_key('a')
-            cv2.putText(image, "Turn left", (50, 50), font, 0.8, (0, 255, 0), 2, cv2.LINE_AA)
-            cv2.line(image, (int(xbp), int(ybp)), (int(xm), int(ym)), (195, 255, 62), 20)
-
-
-        elif co[1][0] > co[0][0] and co[1][1]> co[0][1] and co[1][1] - co[0][1] > 65:
-            print("Turn left.")
-            keyinput.release_key('s')
-            keyinput.release_key('d')
-            keyinput.press_key('a')
-            cv2.putText(image, "Turn left", (50, 50), font, 0.8, (0, 255, 0), 2, cv2.LINE_AA)
-            cv2.line(image, (int(xbp), int(ybp)), (int(xm), int(ym)), (195, 255, 62), 20)
-
-
-        elif co[0][0] > co[1][0] and co[1][1]> co[0][1] and co[1][1] - co[0][1] > 65:
-            print("Turn right.")
-            keyinput.release_key('s')
-            keyinput.release_key('a')
-            keyinput.press_key('d')
-            cv2.putText(image, "Turn right", (50, 50), font, 0.8, (0, 255, 0), 2, cv2.LINE_AA)
-            cv2.line(image, (int(xap), int(yap)), (int(xm), int(ym)), (195, 255, 62), 20)
-
-        elif co[1][0] > co[0][0] and co[0][1]> co[1][1] and co[0][1] - co[1][1] > 65:
-            print("Turn right.")
-            keyinput.release_key('s')
-            keyinput.release_key('a')
-            keyinput.press_key('d')
-            cv2.putText(image, "Turn right", (50, 50), font, 0.8, (0, 255, 0), 2, cv2.LINE_AA)
-            cv2.line(image, (int(xap), int(yap)), (int(xm), int(ym)), (195, 255, 62), 20)
-        
-        else:
-            print("keeping straight")
-            keyinput.release_key('s')
-            keyinput.release_key('a')
-            keyinput.release_key('d')
-            keyinput.press_key('w')
-            cv2.putText(image, "keep straight", (50, 50), font, 0.8, (0, 255, 0), 2, cv2.LINE_AA)
-            if ybp>yap:
-                cv2.line(image, (int(xbp), int(ybp)), (int(xm), int(ym)), (195, 255, 62), 20)
-            else:
-                cv2.line(image, (int(xap), int(yap)), (int(xm), int(ym)), (195, 255, 62), 20)
-
-    if len(co)==1:
-       print("keeping back")
-       keyinput.release_key('a')
-       keyinput.release_key('d')
-       keyinput.release_key('w')
-       keyinput.press_key('s')
-       cv2.putText(image, "keeping back", (50, 50), font, 1.0, (0, 255, 0), 2, cv2.LINE_AA)
-
-    cv2.imshow('MediaPipe Hands', cv2.flip(image, 1))
-
-# Flip the image horizontally for a selfie-view display.
-    if cv2.waitKey(5) & 0xFF == ord('q'):
-      break
-cap.release()
\ No newline at end of file
+        normalizedLandmark = hand_landmarks.landmark[mp_hands.HandLandmark.WRIST]
+        pixelCoordinatesLandmark = mp_drawing._normalized_to_pixel_coordinates(normalizedLandmark.x, normalizedLandmark.y, imageWidth, imageHeight)
+        if pixelCoordinatesLandmark is not None:
+          co.append(list(pixelCoordinatesLandmark))
+    return co
+
+# Press the key for the direction and release the ones it replaces; only changes are sent and returned
+def apply_direction(key_state, direction):
+    released, pressed, _, _ = steering_actions[direction]
+    return key_state.set_keys((key_state.pressed - set(released)) | {pressed})
+
+# Draw the steering wheel, its spoke and the direction label on the image
+def draw_steering(image, steering):
+    label = steering_actions[steering.direction][3]
+    if steering.direction == "back":
+        cv2.putText(image, label, (50, 50), font, 1.0, (0, 255, 0), 2, cv2.LINE_AA)
+        return
+
+    center = (int(steering.center[0]), int(steering.center[1]))
+    wheel_start = (int(steering.wheel_start[0]), int(steering.wheel_start[1]))
+    wheel_end = (int(steering.wheel_end[0]), int(steering.wheel_end[1]))
+    spoke_end = (int(steering.spoke_end[0]), int(steering.spoke_end[1]))
+    cv2.circle(img=image, center=center, radius=150, color=(195, 255, 62), thickness=15)
+    cv2.line(image, wheel_start, wheel_end, (195, 255, 62), 20)
+    cv2.line(image, spoke_end, center, (195, 255, 62), 20)
+    cv2.putText(image, f"{label} ({steering.value:+.2f})", (50, 50), font, 0.8, (0, 255, 0), 2, cv2.LINE_AA)
+
+# Driving mode one frame at a time, for this script, the launcher, replay.py and benchmark.py: the
+# wrists of two hands turn a virtual wheel, one hand backs up, and the keys are held through key_state
+class DrivingInterpreter:
+    create_hands = staticmethod(create_hands)
+    max_hands = 2
+    track_hands = 2  # Crop around both hands while both are in view
+    idle_after = 60
+    mirror = False
+
+    def __init__(self, key_state, turn_threshold=65, dead_zone=10.0, full_lock=60.0, max_hands=2):
+        self.max_hands = max_hands
+        self.key_state = key_state  # A KeyState with a RecordingBackend only records the keys, e.g. in a replay
+        self.engine = SteeringEngine(turn_threshold=turn_threshold, dead_zone=dead_zone, full_lock=full_lock)
+        self.results = None
+        self.steering = None  # Steering of the last frame, None without hands
+
+    # Steer from the wrists in a frame of w x h pixels; returns the direction as one action, or none without hands
+    def update(self, results, w, h, now):
+        self.results = results
+        self.steering = self.engine.update(wrist_points(results, w, h))
+        if self.steering is None:
+            return []
+        direction = self.steering.direction
+        return [ModeAction("steering", "steer", (direction,), None, direction, False)]
+
+    # Hold the keys of the direction; returns the key presses and releases that were sent
+    def actuate(self, actions, now):
+        sent = []
+        for action in actions:
+            for key, pressed in apply_direction(self.key_state, action.gesture):
+                sent.append(ModeAction("steering", "keyDown" if pressed else "keyUp", (key,), None, action.gesture, False))
+        return sent
+
+    # Draw the hands and the wheel of the last frame on it; returns it flipped for a selfie view
+    def draw(self, image):
+        for hand_landmarks in self.results.multi_hand_landmarks or []:
+            mp_drawing.draw_landmarks(
+                image,
+                hand_landmarks,
+                mp_hands.HAND_CONNECTIONS,
+                mp_drawing_styles.get_default_hand_landmarks_style(),
+                mp_drawing_styles.get_default_hand_connections_style())
+        if self.steering is not None:
+            draw_steering(image, self.steering)
+        return cv2.flip(image, 1)
+
+    # Let go of the keys; the key state stays with its owner
+    def close(self):
+        self.key_state.release_all()
+
+def main():
+  parser = argparse.ArgumentParser(description="Driving gesture mode")
+  parser.add_argument("--source", default="0", help="Webcam index, video file or image directory")
+  parser.add_argument("--turn-threshold", type=int, default=65, help="Height difference in pixels between the hands that turns")
+  parser.add_argument("--dead-zone", type=float, default=10.0, help="Wheel angle in degrees that still counts as straight")
+  parser.add_argument("--full-lock", type=float, default=60.0, help="Wheel angle in degrees for full analog steering")
+  parser.add_argument("--input-backend", choices=["auto"] + list(keyinput.backends), default="auto",
+                      help="How key events are sent; auto picks SendInput on Windows and uinput or XTest on Linux")
+  parser.add_argument("--idle-after", type=int, default=60, help="Frames without a hand before detection slows down (0 = never)")
+  parser.add_argument("--idle-fps", type=float, default=3.0, help="Detection rate while no hand is in view")
+  parser.add_argument("--dry-run", action="store_true", help="Record key events instead of sending them")
+  parser.add_argument("--attach", nargs="?", const=default_name, help="Use frames and landmarks from sharedlandmarks.py instead of the camera")
+  parser.add_argument("--record", help="Record the landmarks and key events of this session to a trace file for replay.py")
+  add_metrics_arguments(parser)
+  args = parser.parse_args()
+  try:
+    check_steering_range(args.dead_zone, args.full_lock)
+  except ValueError as e:
+    parser.error(str(e))
+  metrics = create_metrics("driving", args)
+  timer = metrics.timer()
+  key_state = keyinput.KeyState(keyinput.create_backend("record" if args.dry_run else args.input_backend))
+  interpreter = DrivingInterpreter(key_state, args.turn_threshold, args.dead_zone, args.full_lock)
+  recorder = None
+  if args.record:
+    recorder = TraceWriter(args.record, "driving", {"turn_threshold": args.turn_threshold, "dead_zone": args.dead_zone,
+                                                    "full_lock": args.full_lock})
+
+  if args.attach:
+    # The daemon owns the camera and the model, the reader stands in for both
+    cap = LandmarkReader(args.attach, copy_frames=True)  # The hands are drawn into the frame
+    live = True
+  else:
+    # 0 For webcam input, read on a background thread so only the newest frame is processed:
+    live = is_live_source(args.source)
+    cap = open_source(args.source)
+    if live:
+      cap = LatestFrameCapture(cap).start()
+
+  with (nullcontext() if args.attach else create_hands()) as hands, \
+       (nullcontext() if args.attach else create_hands(static_image_mode=True)) as search_hands:
+    if args.attach:
+      scheduler = cap
+    else:
+      tracker = HandTracker(hands, track_hands=interpreter.track_hands, max_hands=interpreter.max_hands, search_hands=search_hands)
+      scheduler = IdleScheduler(tracker, idle_after=args.idle_after, idle_fps=args.idle_fps)
+    while cap.isOpened():
+      timer.start()
+      success, image = cap.read()
+      if not success:
+        if not live:
+          break  # End of the recording
+        print("Ignoring empty camera frame.")
+        continue
+      frame_time = cap.frame_time if live else time.perf_counter()
+      timer.lap("capture")
+      metrics.frame()
+      if live:
+        metrics.set_dropped("camera", cap.frames_dropped)
+
+      results = scheduler.process(image)
+      imageHeight, imageWidth, _ = image.shape
+      timer.lap("inference")
+      if recorder is not None:
+        recorder.add_frame(frame_time, results, image.shape)
+
+      actions = interpreter.update(results, imageWidth, imageHeight, frame_time)
+      timer.lap("classify")
+
+      if interpreter.steering is not None:
+        print(steering_actions[interpreter.steering.direction][2])
+      events = interpreter.actuate(actions, frame_time)
+      if events:
+        metrics.actuated(frame_time)
+        if recorder is not None:
+          for event in events:
+            recorder.add_action(event.source, event.name, *event.args)
+      timer.lap("actuate")
+
+      # Draw the hand annotations on the image, flipped horizontally for a selfie-view display.
+      image = interpreter.draw(image)
+      cv2.putText(image, f"Detection: {scheduler.status()}", (10, imageHeight - 15), font, 0.5, (0, 255, 255), 1)
+      if args.overlay:
+        draw_overlay(image, metrics)
+      cv2.imshow('MediaPipe Hands', image)
+
+      if cv2.waitKey(5) & 0xFF == ord('q'):
+        break
+      timer.lap("render")
+  key_state.close()
+  if recorder is not None:
+    recorder.close()
+  if not args.attach:
+    idle = scheduler.stats()
+    print(f"Detection skipped on {idle['skipped']} frames while idle, woke up {idle['wakeups']} times")
+    tracking = tracker.stats()
+    print(f"Hands tracked in a crop on {tracking['tracked_ratio']:.0%} of frames, lost {tracking['lost']} times")
+  print(f"Sent {key_state.events_sent} key events in {key_state.calls} calls")
+  if live:
+    print(f"Dropped {cap.frames_dropped} of {cap.frames_read} camera frames")
+  cap.release()
+
+if __name__ == "__main__":
+  main()
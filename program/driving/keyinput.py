@@ -1,4 +1,9 @@
+import os
+import sys
 import ctypes
+import ctypes.util
+import struct
+import time
 
 keys = {
     "w":0x11,
@@ -36,16 +41,169 @@ class Input(ctypes.Structure):
     _fields_ = [("type", ctypes.c_ulong),
                 ("ii", Input_I)]
 
-def press_key(key):
-    extra = ctypes.c_ulong(0)
-    ii_ = Input_I()
-    ii_.ki = KeyBdInput( 0, keys[key], 0x0008, 0, ctypes.pointer(extra) )
-    x = Input( ctypes.c_ulong(1), ii_ )
-    ctypes.windll.user32.SendInput(1, ctypes.pointer(x), ctypes.sizeof(x))
-
-def release_key(key):
-    extra = ctypes.c_ulong(0)
-    ii_ = Input_I()
-    ii_.ki = KeyBdInput( 0, keys[key], 0x0008 | 0x0002, 0, ctypes.pointer(extra) )
-    x = Input( ctypes.c_ulong(1), ii_ )
-    ctypes.windll.user32.SendInput(1, ctypes.pointer(x), ctypes.sizeof(x))
\ No newline at end of file
+KEYEVENTF_SCANCODE = 0x0008
+KEYEVENTF_KEYUP = 0x0002
+
+# Sends key events with SendInput. One INPUT structure per key and direction is built up
+# front, and a batch of events is copied into a reused array and sent with a single call.
+class SendInputBackend:
+    def __init__(self):
+        self._extra = ctypes.c_ulong(0)
+        self._inputs = {}
+        for key, scan_code in keys.items():
+            for pressed in (True, False):
+                flags = KEYEVENTF_SCANCODE if pressed else KEYEVENTF_SCANCODE | KEYEVENTF_KEYUP
+                ii_ = Input_I()
+                ii_.ki = KeyBdInput( 0, scan_code, flags, 0, ctypes.pointer(self._extra) )
+                self._inputs[(key, pressed)] = Input( ctypes.c_ulong(1), ii_ )
+        self._batch = (Input * len(self._inputs))()
+        self._send_input = None
+
+    # events is a list of (key, pressed) pairs
+    def send(self, events):
+        if self._send_input is None:
+            self._send_input = ctypes.windll.user32.SendInput
+        for i, event in enumerate(events):
+            self._batch[i] = self._inputs[event]
+        self._send_input(len(events), self._batch, ctypes.sizeof(Input))
+
+    def close(self):
+        pass
+
+# Records key events instead of sending them, to measure and test the event volume anywhere
+class RecordingBackend:
+    def __init__(self):
+        self.events = []  # (time, key, pressed)
+        self.calls = 0
+
+    def send(self, events):
+        now = time.perf_counter()
+        self.calls += 1
+        self.events.extend((now, key, pressed) for key, pressed in events)
+
+    def close(self):
+        pass
+
+# Linux evdev constants from linux/input-event-codes.h and linux/uinput.h
+EV_SYN = 0x00
+EV_KEY = 0x01
+SYN_REPORT = 0
+UI_SET_EVBIT = 0x40045564
+UI_SET_KEYBIT = 0x40045565
+UI_DEV_CREATE = 0x5501
+UI_DEV_DESTROY = 0x5502
+BUS_USB = 0x03
+input_event = struct.Struct("llHHi")  # struct timeval, type, code, value
+sync_report = input_event.pack(0, 0, EV_SYN, SYN_REPORT, 0)
+
+# Sends key events through a virtual keyboard created with /dev/uinput. The scan codes in
+# `keys` are also the evdev key codes (KEY_W = 17, ...), and a batch is one write().
+class UinputBackend:
+    def __init__(self, path="/dev/uinput", name=b"kinesics-keyboard"):
+        import fcntl
+        self._fcntl = fcntl
+        self.fd = os.open(path, os.O_WRONLY | os.O_NONBLOCK)
+        try:
+            fcntl.ioctl(self.fd, UI_SET_EVBIT, EV_KEY)
+            for code in keys.values():
+                fcntl.ioctl(self.fd, UI_SET_KEYBIT, code)
+            # struct uinput_user_dev: name, input_id, ff_effects_max and four abs arrays
+            device = struct.pack("80sHHHHi", name, BUS_USB, 0x1234, 0x5678, 1, 0) + bytes(4 * 64 * 4)
+            os.write(self.fd, device)
+            fcntl.ioctl(self.fd, UI_DEV_CREATE)
+        except OSError:
+            os.close(self.fd)
+            raise
+
+    # The bytes written for a batch: one EV_KEY event per key and a single SYN_REPORT
+    @staticmethod
+    def encode(events):
+        return b"".join(input_event.pack(0, 0, EV_KEY, keys[key], 1 if pressed else 0)
+                        for key, pressed in events) + sync_report
+
+    def send(self, events):
+        os.write(self.fd, self.encode(events))
+
+    def close(self):
+        self._fcntl.ioctl(self.fd, UI_DEV_DESTROY)
+        os.close(self.fd)
+
+# Sends key events to the X server with the XTest extension, flushing once per batch
+class XTestBackend:
+    def __init__(self, display_name=None):
+        x11_path = ctypes.util.find_library("X11")
+        xtst_path = ctypes.util.find_library("Xtst")
+        if x11_path is None or xtst_path is None:
+            raise OSError("libX11 and libXtst are needed for the XTest backend")
+        self._x11 = ctypes.cdll.LoadLibrary(x11_path)
+        self._xtst = ctypes.cdll.LoadLibrary(xtst_path)
+        self._x11.XOpenDisplay.restype = ctypes.c_void_p
+        self._x11.XOpenDisplay.argtypes = [ctypes.c_char_p]
+        self._x11.XStringToKeysym.restype = ctypes.c_ulong
+        self._x11.XStringToKeysym.argtypes = [ctypes.c_char_p]
+        self._x11.XKeysymToKeycode.argtypes = [ctypes.c_void_p, ctypes.c_ulong]
+        self._x11.XFlush.argtypes = [ctypes.c_void_p]
+        self._x11.XCloseDisplay.argtypes = [ctypes.c_void_p]
+        self._xtst.XTestFakeKeyEvent.argtypes = [ctypes.c_void_p, ctypes.c_uint, ctypes.c_int, ctypes.c_ulong]
+
+        self.display = self._x11.XOpenDisplay(display_name.encode() if display_name else None)
+        if not self.display:
+            raise OSError("Cannot open the X display for the XTest backend")
+        self._keycodes = {key: self._x11.XKeysymToKeycode(self.display, self._x11.XStringToKeysym(key.encode()))
+                          for key in keys}
+
+    def send(self, events):
+        for key, pressed in events:
+            self._xtst.XTestFakeKeyEvent(self.display, self._keycodes[key], pressed, 0)
+        self._x11.XFlush(self.display)
+
+    def close(self):
+        self._x11.XCloseDisplay(self.display)
+
+backends = {
+    "sendinput": SendInputBackend,
+    "uinput": UinputBackend,
+    "xtest": XTestBackend,
+    "record": RecordingBackend,
+}
+
+# Pick the input backend for this machine: SendInput on Windows; on Linux a uinput
+# virtual keyboard, or XTest when /dev/uinput cannot be opened
+def create_backend(name="auto"):
+    if name != "auto":
+        return backends[name]()
+    if sys.platform == "win32":
+        return SendInputBackend()
+    try:
+        return UinputBackend()
+    except OSError as error:
+        print(f"uinput not available ({error}), using XTest")
+        return XTestBackend()
+
+# Remembers which keys are held and only sends the keys that change, all in one batch
+class KeyState:
+    def __init__(self, backend=None):
+        self.backend = backend if backend is not None else create_backend()
+        self.pressed = set()
+        self.events_sent = 0
+        self.calls = 0
+
+    # Make exactly the given keys held down; returns the events that were sent
+    def set_keys(self, desired):
+        desired = set(desired)
+        events = [(key, False) for key in sorted(self.pressed - desired)]
+        events += [(key, True) for key in sorted(desired - self.pressed)]
+        if events:
+            self.backend.send(events)
+            self.events_sent += len(events)
+            self.calls += 1
+        self.pressed = desired
+        return events
+
+    def release_all(self):
+        return self.set_keys(())
+
+    # Let go of every key and of the backend, e.g. the uinput virtual keyboard
+    def close(self):
+        self.release_all()
+        self.backend.close()
@@ -0,0 +1,60 @@
+import math
+from collections import namedtuple
+
+# Result of one frame: the discrete direction ("left", "right", "straight" or "back"), the analog
+# steering value in [-1, 1] (negative is left), the wheel angle in degrees and the points to draw
+Steering = namedtuple("Steering", ["direction", "value", "angle", "center", "wheel_start", "wheel_end", "spoke_end"])
+
+
+# The analog range needs 0 <= dead_zone < full_lock; an equal pair divides by zero and a smaller
+# full_lock turns the steering around
+def check_steering_range(dead_zone, full_lock):
+    if not 0 <= dead_zone < full_lock:
+        raise ValueError(f"dead zone ({dead_zone}) must be at least 0 and smaller than full lock ({full_lock})")
+
+
+# Turns the wrist positions of each frame into steering, for one frame at a time
+class SteeringEngine:
+    def __init__(self, radius=150, turn_threshold=65, dead_zone=10.0, full_lock=60.0):
+        check_steering_range(dead_zone, full_lock)
+        self.radius = radius  # Radius of the drawn wheel in pixels
+        self.turn_threshold = turn_threshold  # Height difference in pixels that turns the wheel
+        self.dead_zone = dead_zone  # Wheel angle in degrees that still counts as straight
+        self.full_lock = full_lock  # Wheel angle in degrees that gives full analog steering
+
+    # co is the list of wrist pixel coordinates; returns None when no hand is visible
+    def update(self, co):
+        if len(co) == 1:
+            center = (float(co[0][0]), float(co[0][1]))
+            return Steering("back", 0.0, 0.0, center, center, center, center)
+        if len(co) != 2:
+            return None
+
+        # The wheel angle is 0 when the hands are level and positive when the wheel is turned right.
+        # A hand more than turn_threshold pixels lower than the other turns the wheel.
+        (x0, y0), (x1, y1) = co
+        if x1 < x0:
+            x0, y0, x1, y1 = x1, y1, x0, y0  # Left hand first
+        dx, dy = x1 - x0, y1 - y0
+        angle = math.degrees(math.atan2(-dy, dx))
+        if dx > 0 and dy > self.turn_threshold:
+            direction = "left"
+        elif dx > 0 and dy < -self.turn_threshold:
+            direction = "right"
+        else:
+            direction = "straight"
+        # Straight ahead never steers, also when the hands are above each other and the angle is ±90
+        value = 0.0
+        if direction != "straight":
+            travel = min(max((abs(angle) - self.dead_zone) / (self.full_lock - self.dead_zone), 0.0), 1.0)
+            value = math.copysign(travel, angle)
+
+        # Wheel line along the hands, spoke perpendicular to it pointing down
+        rad = math.radians(angle)
+        ux, uy = math.cos(rad), -math.sin(rad)
+        xm, ym = (x0 + x1) / 2, (y0 + y1) / 2
+        r = self.radius
+        return Steering(
+            direction, value, angle, (xm, ym),
+            (xm - r * ux, ym - r * uy), (xm + r * ux, ym + r * uy),
+            (xm - r * uy, ym + r * ux))
@@ -0,0 +1,66 @@
+import os
+import pytest
+
+from keyinput import KeyState, RecordingBackend, UinputBackend, input_event, keys, EV_KEY, EV_SYN, SYN_REPORT
+
+
+def recorded(key_state):
+    return [(key, pressed) for _, key, pressed in key_state.backend.events]
+
+
+def test_only_transitions_are_sent():
+    key_state = KeyState(RecordingBackend())
+    assert key_state.set_keys({"w"}) == [("w", True)]
+    assert key_state.set_keys({"w"}) == []  # Held keys are not sent again
+    assert key_state.set_keys({"a", "w"}) == [("a", True)]
+    assert key_state.set_keys({"d"}) == [("a", False), ("w", False), ("d", True)]
+    assert recorded(key_state) == [("w", True), ("a", True), ("a", False), ("w", False), ("d", True)]
+    assert key_state.pressed == {"d"}
+
+
+def test_one_call_per_change():
+    key_state = KeyState(RecordingBackend())
+    key_state.set_keys({"s"})
+    key_state.set_keys({"s"})
+    key_state.set_keys({"a", "w"})  # Releases s and presses a and w in one batch
+    assert key_state.backend.calls == 2
+    assert key_state.calls == 2
+    assert key_state.events_sent == 4
+
+
+def test_releases_come_before_presses():
+    key_state = KeyState(RecordingBackend())
+    key_state.set_keys({"w", "s"})
+    events = key_state.set_keys({"a", "d"})
+    assert events == [("s", False), ("w", False), ("a", True), ("d", True)]
+
+
+def test_close_lets_go_of_every_key():
+    key_state = KeyState(RecordingBackend())
+    key_state.set_keys({"w", "d"})
+    key_state.close()
+    assert key_state.pressed == set()
+    assert recorded(key_state)[-2:] == [("d", False), ("w", False)]
+    key_state.release_all()
+    assert key_state.backend.calls == 2  # Nothing left to release
+
+
+def test_uinput_batch_is_key_events_and_one_sync():
+    data = UinputBackend.encode([("a", False), ("w", True)])
+    assert len(data) == 3 * input_event.size
+    events = [event[2:] for event in input_event.iter_unpack(data)]  # Without the timestamp
+    assert events == [(EV_KEY, keys["a"], 0), (EV_KEY, keys["w"], 1), (EV_SYN, SYN_REPORT, 0)]
+    assert [event[:2] for event in input_event.iter_unpack(data)] == [(0, 0)] * 3  # The kernel stamps the time
+
+
+def test_uinput_key_codes_are_evdev_codes():
+    # KEY_W, KEY_A, KEY_S and KEY_D in linux/input-event-codes.h
+    assert keys == {"w": 17, "a": 30, "s": 31, "d": 32}
+
+
+@pytest.mark.skipif(not os.access("/dev/uinput", os.W_OK), reason="needs write access to /dev/uinput")
+def test_uinput_virtual_keyboard():
+    key_state = KeyState(UinputBackend())
+    key_state.set_keys({"w"})
+    key_state.close()
+    assert key_state.events_sent == 2
@@ -0,0 +1,74 @@
+import itertools
+import pytest
+
+from steering import SteeringEngine, check_steering_range
+
+
+# The decision of the original driving_mode.py for two wrists, None where it skipped the frame
+def baseline_direction(co, threshold=65):
+    (x0, y0), (x1, y1) = co
+    if x1 == x0:
+        return None  # The slope divided by zero
+    if x0 > x1 and y0 > y1 and y0 - y1 > threshold:
+        return "left"
+    elif x1 > x0 and y1 > y0 and y1 - y0 > threshold:
+        return "left"
+    elif x0 > x1 and y1 > y0 and y1 - y0 > threshold:
+        return "right"
+    elif x1 > x0 and y0 > y1 and y0 - y1 > threshold:
+        return "right"
+    return "straight"
+
+
+def test_directions_follow_the_baseline_rules():
+    engine = SteeringEngine()
+    positions = [0, 1, 40, 64, 65, 66, 120, 300]
+    for x0, y0, x1, y1 in itertools.product(positions, repeat=4):
+        co = [(x0, y0), (x1, y1)]
+        expected = baseline_direction(co)
+        if expected is not None:
+            assert engine.update(co).direction == expected, co
+
+
+def test_hand_order_does_not_matter():
+    engine = SteeringEngine()
+    a, b = (100, 300), (400, 150)
+    assert engine.update([a, b]) == engine.update([b, a])
+
+
+def test_vertical_pair_is_straight_without_steering():
+    steering = SteeringEngine().update([(200, 100), (200, 400)])
+    assert steering.direction == "straight"
+    assert steering.value == 0.0
+
+
+def test_one_hand_backs_up_and_no_hands_do_nothing():
+    engine = SteeringEngine()
+    assert engine.update([(10, 20)]).direction == "back"
+    assert engine.update([]) is None
+    assert engine.update([(0, 0), (1, 1), (2, 2)]) is None
+
+
+def test_analog_value_follows_the_wheel_angle():
+    engine = SteeringEngine(turn_threshold=65, dead_zone=10.0, full_lock=60.0)
+    level = engine.update([(0, 0), (300, 0)])
+    assert level.angle == 0.0 and level.value == 0.0
+    left = engine.update([(0, 0), (100, 200)])  # Right hand far lower: past full lock
+    assert left.direction == "left" and left.value == -1.0
+    right = engine.update([(0, 200), (200, 0)])  # 45 degrees, 0.7 of the way from the dead zone to full lock
+    assert right.direction == "right" and right.value == pytest.approx(0.7)
+
+
+def test_straight_never_steers():
+    engine = SteeringEngine()
+    for dy in range(-65, 66, 5):
+        steering = engine.update([(0, 0), (20, dy)])
+        assert steering.direction == "straight" and steering.value == 0.0
+
+
+@pytest.mark.parametrize("dead_zone, full_lock", [(10.0, 10.0), (60.0, 10.0), (-1.0, 60.0)])
+def test_invalid_steering_range_is_rejected(dead_zone, full_lock):
+    with pytest.raises(ValueError):
+        check_steering_range(dead_zone, full_lock)
+    with pytest.raises(ValueError):
+        SteeringEngine(dead_zone=dead_zone, full_lock=full_lock)
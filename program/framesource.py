@@ -0,0 +1,45 @@
+import os
+import cv2
+
+image_extensions = (".png", ".jpg", ".jpeg", ".bmp")
+
+
+# Plays back a directory of images in file-name order, with the same interface as cv2.VideoCapture
+class ImageSequenceCapture:
+    def __init__(self, directory):
+        self.paths = sorted(
+            os.path.join(directory, name) for name in os.listdir(directory)
+            if name.lower().endswith(image_extensions)
+        )
+        self.position = 0
+
+    def read(self):
+        while self.position < len(self.paths):
+            frame = cv2.imread(self.paths[self.position])
+            self.position += 1
+            if frame is not None:
+                return True, frame
+        return False, None
+
+    def isOpened(self):
+        return self.position < len(self.paths)
+
+    def release(self):
+        self.position = len(self.paths)
+
+
+# Open a frame source: a webcam index ("0"), a video file (e.g. .data/<action>/<seq>.avi)
+# or a directory of images
+def open_source(source=0):
+    if isinstance(source, int) or str(source).isdigit():
+        return cv2.VideoCapture(int(source))
+    if os.path.isdir(source):
+        return ImageSequenceCapture(source)
+    if not os.path.exists(source):
+        raise FileNotFoundError(f"Frame source not found: {source}")
+    return cv2.VideoCapture(source)
+
+
+# True when the source is a live camera rather than a recording
+def is_live_source(source):
+    return isinstance(source, int) or str(source).isdigit()
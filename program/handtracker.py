@@ -0,0 +1,102 @@
+import cv2
+
+
+# Runs MediaPipe Hands on a crop around the hands instead of the whole camera frame. Once the
+# hands are found, the next frame is cropped to the padded box around their landmarks and scaled
+# down so the landmark model gets about the same amount of pixels whatever the camera resolution.
+# When the crop loses a hand, the whole frame (downscaled) is searched again. Landmarks are mapped
+# back into the whole frame, so the results read exactly like those of hands.process().
+# While fewer than max_hands hands are tracked, the whole frame is searched every search_every
+# frames as well, so a hand entering outside the crop (another user) is still found.
+# Crops and whole frames go to different Hands: a video-mode Hands seeds each frame with the landmarks
+# of the previous one, which is wrong when the previous image had another geometry. search_hands (in
+# static image mode, so every search runs the palm detector) takes the whole frames; when it is None,
+# hands is used for both, which is only right if hands is in static image mode itself.
+class HandTracker:
+    def __init__(self, hands, track_hands=1, padding=0.5, crop_size=256, search_size=640, max_hands=1, search_every=15,
+                 search_hands=None):
+        self.hands = hands  # Crops
+        self.search_hands = search_hands if search_hands is not None else hands  # Whole frames
+        self.track_hands = track_hands  # Hands that must stay in the crop for tracking to continue
+        self.max_hands = max_hands
+        self.search_every = search_every
+        self.padding = padding  # Margin on each side of the landmark box, as a fraction of its larger side
+        self.crop_size = crop_size  # Largest side of a crop given to MediaPipe
+        self.search_size = search_size  # Largest side of the whole frame when searching for hands
+        self.roi = None  # (x0, y0, x1, y1) crop in frame pixels, None while searching
+        self.tracked_frames = 0
+        self.searched_frames = 0
+        self.lost = 0
+        self._since_search = 0
+        self._found = 0  # Hands in the last results
+
+    def reset(self):
+        self.roi = None
+
+    # Detect hands in a BGR frame
+    def process(self, frame):
+        h, w = frame.shape[:2]
+        results = None
+        search_due = self._found < self.max_hands and self._since_search >= self.search_every
+        if self.roi is not None and not search_due:
+            results = self._run(frame, self.roi, self.crop_size)
+            if results.multi_hand_landmarks and len(results.multi_hand_landmarks) >= self.track_hands:
+                self.tracked_frames += 1
+            else:
+                self.lost += 1
+                results = None
+        if results is None:
+            results = self._run(frame, None, self.search_size)
+            self.searched_frames += 1
+            self._since_search = 0
+        else:
+            self._since_search += 1
+        self._found = len(results.multi_hand_landmarks or [])
+        self.roi = self._next_roi(results, w, h)
+        return results
+
+    def _run(self, frame, roi, size):
+        h, w = frame.shape[:2]
+        x0, y0, x1, y1 = roi if roi is not None else (0, 0, w, h)
+        image = frame[y0:y1, x0:x1]
+        scale = size / max(x1 - x0, y1 - y0)
+        if scale < 1:
+            image = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        hands = self.hands if roi is not None else self.search_hands
+        results = hands.process(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
+
+        if roi is not None and results.multi_hand_landmarks:
+            # Crop coordinates to whole-frame coordinates; z is on the same scale as x
+            crop_w, crop_h = x1 - x0, y1 - y0
+            for hand_landmarks in results.multi_hand_landmarks:
+                for lm in hand_landmarks.landmark:
+                    lm.x = (x0 + lm.x * crop_w) / w
+                    lm.y = (y0 + lm.y * crop_h) / h
+                    lm.z = lm.z * crop_w / w
+        return results
+
+    # Square crop around the landmarks of all hands, or None when not enough hands were found
+    def _next_roi(self, results, w, h):
+        hands = results.multi_hand_landmarks
+        if not hands or len(hands) < self.track_hands:
+            return None
+        xs = [lm.x for hand_landmarks in hands for lm in hand_landmarks.landmark]
+        ys = [lm.y for hand_landmarks in hands for lm in hand_landmarks.landmark]
+        left, right = min(xs) * w, max(xs) * w
+        top, bottom = min(ys) * h, max(ys) * h
+        half = max(right - left, bottom - top) * (0.5 + self.padding)
+        cx, cy = (left + right) / 2, (top + bottom) / 2
+        x0, y0 = max(int(cx - half), 0), max(int(cy - half), 0)
+        x1, y1 = min(int(cx + half) + 1, w), min(int(cy + half) + 1, h)
+        if x1 - x0 < 16 or y1 - y0 < 16:
+            return None
+        return x0, y0, x1, y1
+
+    def stats(self):
+        frames = self.tracked_frames + self.searched_frames
+        return {
+            "tracked_frames": self.tracked_frames,
+            "searched_frames": self.searched_frames,
+            "lost": self.lost,
+            "tracked_ratio": self.tracked_frames / frames if frames else 0.0,
+        }
@@ -0,0 +1,134 @@
+import numpy as np
+
+palm = [0, 5, 9, 13, 17]  # Wrist and the finger bases; their mean moves least while the fingers do
+
+
+# Copies the landmarks of every detected hand into one reused (N, 21, 3) float32 array. The
+# coordinates are stored one by one through a flat view; the array only grows when more hands show up.
+class PointsBuffer:
+    def __init__(self, size=2):
+        self._allocate(size)
+
+    def _allocate(self, size):
+        self.points = np.zeros((size, 21, 3), dtype=np.float32)
+        self._values = memoryview(self.points).cast("B").cast("f")
+
+    # The (N, 21, 3) landmarks of results, a view that the next fill() overwrites
+    def fill(self, results):
+        hands = results.multi_hand_landmarks or []
+        if len(hands) > len(self.points):
+            self._allocate(len(hands))
+        values = self._values
+        i = 0
+        for hand_landmarks in hands:
+            for lm in hand_landmarks.landmark:
+                values[i] = lm.x
+                values[i + 1] = lm.y
+                values[i + 2] = lm.z
+                i += 3
+        return self.points[:len(hands)]
+
+
+# (label, score) of every detected hand, ("Unknown", 0) where MediaPipe gave no handedness
+def results_handedness(results):
+    hands = results.multi_hand_landmarks or []
+    handedness = results.multi_handedness or []
+    labels = []
+    for i in range(len(hands)):
+        if i < len(handedness):
+            classification = handedness[i].classification[0]
+            labels.append((classification.label, classification.score))
+        else:
+            labels.append(("Unknown", 0.0))
+    return labels
+
+
+# One hand followed from frame to frame
+class HandTrack:
+    def __init__(self, track_id, center, state):
+        self.track_id = track_id
+        self.center = center  # Palm center in normalized frame coordinates
+        self.state = state  # Whatever the mode keeps per hand, e.g. its gesture
+        self.landmarks = None  # MediaPipe landmark list of the newest frame
+        self.points = None  # The same as a (21, 3) array, valid until the next update of the tracks
+        self.missed = 0  # Frames in a row this hand was not found
+        self.frames = 0
+        self._votes = {}  # Handedness label -> summed score over the frames seen
+
+    # Left or Right by the score MediaPipe gave each label over all frames, so one wrong frame does not flip it
+    @property
+    def handedness(self):
+        return max(self._votes, key=self._votes.get) if self._votes else "Unknown"
+
+    def label(self):
+        return f"#{self.track_id} {self.handedness}"
+
+
+# Gives every hand a track ID that stays the same while the hand is in view. Detections are matched
+# to the tracks of the previous frames by the distance between palm centers, closest pairs first,
+# with handedness as a penalty rather than a rule. A track survives max_missed frames without its hand
+# so a hand that MediaPipe misses for a moment keeps its ID and its state.
+class HandTracks:
+    def __init__(self, max_distance=0.2, max_missed=5, handedness_penalty=0.1, new_state=dict):
+        self.max_distance = max_distance  # Largest palm movement between frames, as a fraction of the frame
+        self.max_missed = max_missed
+        self.handedness_penalty = handedness_penalty
+        self.new_state = new_state
+        self.tracks = {}  # Track ID -> HandTrack
+        self.points = np.zeros((0, 21, 3), dtype=np.float32)  # Landmarks of the hands of the last update
+        self._buffer = PointsBuffer()
+        self._next_id = 1
+
+    def reset(self):
+        self.tracks.clear()
+        self.points = np.zeros((0, 21, 3), dtype=np.float32)
+
+    # The tracks of the hands in results, in the order of results.multi_hand_landmarks
+    def update(self, results):
+        points = self._buffer.fill(results)
+        handedness = results_handedness(results)
+        centers = points[:, palm, :2].mean(axis=1)
+        tracks = list(self.tracks.values())
+
+        matched = [None] * len(points)
+        if tracks and len(points):
+            previous = np.array([track.center for track in tracks])
+            costs = np.linalg.norm(centers[:, None] - previous[None], axis=2)
+            for i, (label, _) in enumerate(handedness):
+                for j, track in enumerate(tracks):
+                    if track._votes and label != track.handedness:
+                        costs[i, j] += self.handedness_penalty
+            # Closest pairs first; every detection and every track is used once
+            used = set()
+            for flat in np.argsort(costs, axis=None):
+                i, j = divmod(int(flat), len(tracks))
+                if costs[i, j] > self.max_distance:
+                    break
+                if matched[i] is None and j not in used:
+                    matched[i] = tracks[j]
+                    used.add(j)
+
+        seen = set()
+        for i, hand_landmarks in enumerate(results.multi_hand_landmarks or []):
+            track = matched[i]
+            if track is None:
+                track = HandTrack(self._next_id, None, self.new_state())
+                self.tracks[track.track_id] = track
+                self._next_id += 1
+                matched[i] = track
+            label, score = handedness[i]
+            track._votes[label] = track._votes.get(label, 0.0) + score
+            track.center = centers[i]
+            track.landmarks = hand_landmarks
+            track.points = points[i]
+            track.missed = 0
+            track.frames += 1
+            seen.add(track.track_id)
+
+        for track_id, track in list(self.tracks.items()):
+            if track_id not in seen:
+                track.missed += 1
+                if track.missed > self.max_missed:
+                    del self.tracks[track_id]
+        self.points = points
+        return matched
@@ -0,0 +1,164 @@
+import os
+import json
+from collections import namedtuple
+import numpy as np
+
+trace_magic = b"KTRC"
+trace_version = 1
+handedness_labels = ("Left", "Right", "Unknown")
+
+# Start of a trace file; the frames follow at header_size and the actions after the last frame
+header_dtype = np.dtype([
+    ("magic", "S4"),
+    ("version", "<i4"),
+    ("max_hands", "<i4"),
+    ("width", "<i4"),
+    ("height", "<i4"),
+    ("frames", "<i8"),
+    ("actions", "<i8"),
+    ("actions_offset", "<i8"),  # 0 until the recording was closed
+    ("mode", "S16"),
+    ("options", "S400"),  # JSON of the mode settings that change its decisions, e.g. the turn threshold
+], align=True)
+header_size = 512
+
+
+# One recorded frame: when it was captured and the landmarks found on it
+def frame_dtype(max_hands):
+    return np.dtype([
+        ("time", "<f8"),  # time.perf_counter() of the recording process when the frame was captured
+        ("hands", "<i4"),
+        ("labels", "i1", (max_hands,)),  # Index into handedness_labels
+        ("scores", "<f4", (max_hands,)),
+        ("points", "<f4", (max_hands, 21, 3)),
+    ], align=True)
+
+
+# One action the mode emitted: the frame it came from, what produced it and the call with its arguments
+action_dtype = np.dtype([
+    ("frame", "<i8"),
+    ("source", "S16"),  # e.g. "gesture", "motion" or "steering"
+    ("name", "S16"),
+    ("args", "S64"),  # JSON list
+])
+
+# Results built from a trace frame; they read like the results of hands.process()
+Landmark = namedtuple("Landmark", "x y z")
+HandLandmarks = namedtuple("HandLandmarks", "landmark")
+Classification = namedtuple("Classification", "index label score")
+Handedness = namedtuple("Handedness", "classification")
+TraceResults = namedtuple("TraceResults", "multi_hand_landmarks multi_handedness")
+
+TraceAction = namedtuple("TraceAction", "frame source name args")
+
+
+# Records the landmarks of every frame and the actions of a session. Frames are appended to the file
+# as they come, so a long session never sits in memory; close() adds the actions and the final header.
+class TraceWriter:
+    def __init__(self, path, mode, options=None, max_hands=2):
+        self.path = path
+        self.max_hands = max_hands
+        self.dtype = frame_dtype(max_hands)
+        self.header = np.zeros((), header_dtype)
+        self.header["magic"] = trace_magic
+        self.header["version"] = trace_version
+        self.header["max_hands"] = max_hands
+        self.header["mode"] = mode.encode()
+        self.header["options"] = json.dumps(options or {}).encode()
+        self.frames = 0
+        self.actions = []
+        self.truncated = 0  # Frames with more hands than max_hands
+        self._record = np.zeros((), self.dtype)
+        self.file = open(path, "wb")
+        self._write_header()
+
+    def _write_header(self):
+        self.file.seek(0)
+        self.file.write(self.header.tobytes().ljust(header_size, b"\0"))
+
+    def add_frame(self, frame_time, results, shape=None):
+        if shape is not None and not self.header["width"]:
+            self.header["height"], self.header["width"] = shape[:2]
+        hands = results.multi_hand_landmarks or []
+        handedness = results.multi_handedness or []
+        if len(hands) > self.max_hands:
+            self.truncated += 1
+        record = self._record
+        record.fill(0)
+        record["time"] = frame_time
+        count = min(len(hands), self.max_hands)
+        record["hands"] = count
+        for i in range(count):
+            record["points"][i] = [(lm.x, lm.y, lm.z) for lm in hands[i].landmark]
+            label, score = len(handedness_labels) - 1, 0.0
+            if i < len(handedness):
+                classification = handedness[i].classification[0]
+                label, score = handedness_labels.index(classification.label), classification.score
+            record["labels"][i] = label
+            record["scores"][i] = score
+        self.file.write(record.tobytes())
+        self.frames += 1
+
+    # An action emitted for the last frame added, e.g. add_action("gesture", "press", "A")
+    def add_action(self, source, name, *args):
+        self.actions.append((self.frames - 1, source, name, json.dumps(list(args))))
+
+    def close(self):
+        actions = np.array(self.actions, dtype=action_dtype)
+        self.header["frames"] = self.frames
+        self.header["actions"] = len(actions)
+        self.header["actions_offset"] = header_size + self.frames * self.dtype.itemsize
+        self.file.write(actions.tobytes())
+        self._write_header()
+        self.file.close()
+        print(f"Recorded {self.frames} frames and {len(actions)} actions to {self.path}")
+        if self.truncated:
+            print(f"{self.truncated} frames had more than {self.max_hands} hands, the extra hands were not recorded")
+
+
+# A recorded session. The frames are memory-mapped, so opening even a long trace is instant and
+# replaying it only reads the pages it touches.
+class Trace:
+    def __init__(self, path):
+        header = np.fromfile(path, dtype=header_dtype, count=1)
+        if not len(header) or header[0]["magic"] != trace_magic:
+            raise ValueError(f"{path} is not a landmark trace")
+        header = header[0]
+        if header["version"] > trace_version:
+            raise ValueError(f"{path} is a version {header['version']} trace, this program reads up to {trace_version}")
+        self.path = path
+        self.mode = header["mode"].decode()
+        self.options = json.loads(header["options"].decode() or "{}")
+        self.max_hands = int(header["max_hands"])
+        self.width = int(header["width"])
+        self.height = int(header["height"])
+        dtype = frame_dtype(self.max_hands)
+        frames = int(header["frames"])
+        if not header["actions_offset"]:
+            # The recording was not closed; every complete frame is still there
+            frames = (os.path.getsize(path) - header_size) // dtype.itemsize
+        self.frames = np.memmap(path, dtype=dtype, mode="r", offset=header_size, shape=(frames,)) if frames else np.zeros(0, dtype)
+        self.actions = []
+        if header["actions_offset"] and header["actions"]:
+            with open(path, "rb") as f:
+                f.seek(int(header["actions_offset"]))
+                actions = np.fromfile(f, dtype=action_dtype, count=int(header["actions"]))
+            self.actions = [TraceAction(int(action["frame"]), action["source"].decode(), action["name"].decode(),
+                                        tuple(json.loads(action["args"].decode()))) for action in actions]
+
+    def __len__(self):
+        return len(self.frames)
+
+    # The landmarks of frame i as MediaPipe results
+    def results(self, i):
+        record = self.frames[i]
+        hands = int(record["hands"])
+        if not hands:
+            return TraceResults(None, None)
+        hand_landmarks = []
+        handedness = []
+        for points, label, score in zip(record["points"][:hands].tolist(), record["labels"][:hands].tolist(),
+                                        record["scores"][:hands].tolist()):
+            hand_landmarks.append(HandLandmarks([Landmark(x, y, z) for x, y, z in points]))
+            handedness.append(Handedness([Classification(label, handedness_labels[label], score)]))
+        return TraceResults(hand_landmarks, handedness)
@@ -1,22 +1,88 @@
 import tkinter as tk
+from tkinter import messagebox
 import subprocess
 import webbrowser
 import os
+import argparse
+import cv2
+from modehost import ModeHost, default_sequence_model, parse_action_keys
+
+parser = argparse.ArgumentParser(description="Kinesics mode selector")
+parser.add_argument("--sequence-model", default=default_sequence_model,
+                    help="Advanced mode action model trained with sequence_classifier.py, used when the file exists")
+parser.add_argument("--action-keys", default="", help="Keys for recorded actions in advanced mode, e.g. 0=LEFT,1=RIGHT")
+args = parser.parse_args()
+
+preview_window = "Kinesics"
+
+# One engine for all modes: the camera stays open and the hand models stay loaded between switches
+host = ModeHost(sequence_model=args.sequence_model, action_keys=parse_action_keys(args.action_keys)).start()
+shown_frame = 0
+preview_mode = None  # The mode last asked for; only its frames are shown
+
+def open_mode(mode):
+    global preview_mode
+    preview_mode = mode
+    host.switch(mode)
+    minimize_after_delay()
 
 def open_classic_mode():
-    subprocess.Popen(['python', 'classic/classic_mode.py'])
-    minimize_after_delay()
+    open_mode("classic")
 
 def open_driving_mode():
-    subprocess.Popen(['python', 'driving/driving_mode.py'])
-    minimize_after_delay()
+    if host.key_error is not None:
+        messagebox.showerror("Driving Mode", f"Driving mode cannot send keys: {host.key_error}")
+        return
+    open_mode("driving")
 
 def open_advanced_mode():
-    subprocess.Popen(['python', 'advanced/advanced_mode.py'])
-    minimize_after_delay()
+    open_mode("advanced")
+
+# The full advanced mode window registers new gestures; it needs the camera, so the engine lets go of it meanwhile
+def open_gesture_editor():
+    global preview_mode
+    preview_mode = None
+    host.switch(None)
+    host.stop()
+    cv2.destroyAllWindows()
+    editor = subprocess.Popen(['python', 'advanced/advanced_mode.py', '--sequence-model', args.sequence_model,
+                               '--action-keys', args.action_keys])
+    wait_for_editor(editor)
+
+def wait_for_editor(editor):
+    if editor.poll() is None:
+        root.after(500, wait_for_editor, editor)
+    else:
+        host.start()
+
+# Show the newest frame of the running mode; 'q' in the preview stops the mode. The worker may still
+# draw a frame of the previous mode after a switch, so frames are shown only if they come from preview_mode.
+def show_preview():
+    global shown_frame, preview_mode
+    frame_number, mode, image = host.latest()
+    if preview_mode is not None and mode == preview_mode and frame_number != shown_frame:
+        shown_frame = frame_number
+        cv2.imshow(preview_window, image)
+    if preview_mode is not None and cv2.waitKey(1) & 0xFF == ord('q'):
+        preview_mode = None
+        host.switch(None)
+        cv2.destroyAllWindows()
+        root.deiconify()
+    error = host.take_error()
+    if error is not None:
+        preview_mode = None
+        cv2.destroyAllWindows()
+        root.deiconify()
+        messagebox.showerror("Mode Selector", error)
+    root.after(15, show_preview)
 
 def minimize_after_delay():
-    root.after(5000, root.iconify)  # Minimize the window after 5 seconds
+    root.after(5000, minimize_if_running)  # Minimize the window after 5 seconds
+
+# A mode that was stopped or failed to start meanwhile keeps the selector in view
+def minimize_if_running():
+    if preview_mode is not None:
+        root.iconify()
 
 # Functions to open HTML files
 def open_about():
@@ -64,6 +130,9 @@ driving_button = tk.Button(button_frame, text="Driving Mode", command=open_drivi
 advanced_button = tk.Button(button_frame, text="Advanced Mode", command=open_advanced_mode, 
                             font=button_font, bg=button_bg, fg=button_fg,
                             activebackground=button_active_bg, width=20, bd=0, pady=5)
+editor_button = tk.Button(button_frame, text="Register Gestures", command=open_gesture_editor,
+                          font=button_font, bg=button_bg, fg=button_fg,
+                          activebackground=button_active_bg, width=20, bd=0, pady=5)
 
 # Create the Exit button below the Advanced Mode button
 exit_button = tk.Button(button_frame, text="Exit", command=root.quit, 
@@ -74,6 +143,7 @@ exit_button = tk.Button(button_frame, text="Exit", command=root.quit,
 classic_button.pack(pady=10)
 driving_button.pack(pady=10)
 advanced_button.pack(pady=10)
+editor_button.pack(pady=10)
 exit_button.pack(pady=10)
 
 # Create a frame for hyperlinks in the bottom-right corner
@@ -94,4 +164,8 @@ help_link.bind("<Button-1>", lambda e: open_help())
 help_link.pack(side="left", padx=5)
 
 # Run the application
+show_preview()
 root.mainloop()
+
+host.close()
+cv2.destroyAllWindows()
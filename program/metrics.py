@@ -0,0 +1,220 @@
+import json
+import time
+import bisect
+import threading
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import cv2
+
+# Histogram bucket upper bounds in seconds
+latency_buckets = (0.001, 0.002, 0.005, 0.01, 0.02, 0.033, 0.05, 0.1, 0.2, 0.5, 1.0)
+
+
+# Latency histogram with fixed buckets, as Prometheus expects them
+class Histogram:
+    def __init__(self, buckets=latency_buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # The last one is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+
+    # Estimated quantile in seconds, interpolated inside the bucket it falls in
+    def quantile(self, q):
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                lower = self.buckets[i - 1] if i else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.buckets[-1]
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "mean_ms": self.sum / self.count * 1000 if self.count else 0.0,
+            "p50_ms": self.quantile(0.5) * 1000,
+            "p95_ms": self.quantile(0.95) * 1000,
+        }
+
+
+# Times the stages of one frame on one thread; each lap is added to the metrics
+class FrameTimer:
+    def __init__(self, metrics):
+        self.metrics = metrics
+        self._last = 0.0
+
+    def start(self, at=None):
+        self._last = time.perf_counter() if at is None else at
+
+    def lap(self, stage):
+        now = time.perf_counter()
+        self.metrics.observe(stage, now - self._last)
+        self._last = now
+
+
+# Latency per frame stage, camera-to-actuation latency, frame rate and dropped frames of one mode.
+# Safe to update from the capture, UI and actuation threads at the same time.
+class Metrics:
+    def __init__(self, mode, fps_window=60):
+        self.mode = mode
+        self.stages = {}
+        self.actuation = Histogram()  # From the frame arriving until its action was carried out
+        self.frames = 0
+        self.dropped = {}  # Where frames were dropped -> total
+        self._frame_times = deque(maxlen=fps_window)
+        self._lock = threading.Lock()
+
+    def timer(self):
+        return FrameTimer(self)
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            if stage not in self.stages:
+                self.stages[stage] = Histogram()
+            self.stages[stage].observe(seconds)
+
+    def frame(self):
+        with self._lock:
+            self.frames += 1
+            self._frame_times.append(time.perf_counter())
+
+    # Record the actuation of an action that came from the frame captured at frame_time (time.perf_counter())
+    def actuated(self, frame_time):
+        seconds = time.perf_counter() - frame_time
+        with self._lock:
+            self.actuation.observe(seconds)
+
+    def set_dropped(self, source, total):
+        with self._lock:
+            self.dropped[source] = total
+
+    def fps(self):
+        times = self._frame_times
+        if len(times) < 2 or times[-1] == times[0]:
+            return 0.0
+        return (len(times) - 1) / (times[-1] - times[0])
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "time": time.time(),
+                "mode": self.mode,
+                "fps": self.fps(),
+                "frames": self.frames,
+                "dropped": dict(self.dropped),
+                "stages": {name: histogram.summary() for name, histogram in self.stages.items()},
+                "actuation": self.actuation.summary(),
+            }
+
+    # Short lines for drawing over the camera view
+    def overlay_lines(self):
+        snapshot = self.snapshot()
+        lines = [f"{snapshot['fps']:.1f} FPS, dropped " +
+                 (", ".join(f"{source} {total}" for source, total in snapshot["dropped"].items()) or "0")]
+        for name, stats in snapshot["stages"].items():
+            lines.append(f"{name}: {stats['mean_ms']:.1f} ms mean, {stats['p95_ms']:.1f} ms p95")
+        actuation = snapshot["actuation"]
+        if actuation["count"]:
+            lines.append(f"camera to action: {actuation['mean_ms']:.0f} ms mean, {actuation['p95_ms']:.0f} ms p95")
+        return lines
+
+    def prometheus_text(self):
+        out = []
+
+        def histogram(name, labels, h):
+            for bound, total in zip(list(h.buckets) + ["+Inf"], _cumulative(h.counts)):
+                out.append(f'{name}_bucket{{{labels},le="{bound}"}} {total}')
+            out.append(f"{name}_sum{{{labels}}} {h.sum}")
+            out.append(f"{name}_count{{{labels}}} {h.count}")
+
+        mode = f'mode="{self.mode}"'
+        with self._lock:
+            out.append("# HELP kinesics_stage_seconds Time spent in each stage of a frame")
+            out.append("# TYPE kinesics_stage_seconds histogram")
+            for stage, h in self.stages.items():
+                histogram("kinesics_stage_seconds", f'{mode},stage="{stage}"', h)
+            out.append("# HELP kinesics_actuation_latency_seconds Time from a frame arriving to its action being carried out")
+            out.append("# TYPE kinesics_actuation_latency_seconds histogram")
+            histogram("kinesics_actuation_latency_seconds", mode, self.actuation)
+            out.append("# TYPE kinesics_frames_total counter")
+            out.append(f"kinesics_frames_total{{{mode}}} {self.frames}")
+            out.append("# TYPE kinesics_fps gauge")
+            out.append(f"kinesics_fps{{{mode}}} {self.fps():.2f}")
+            out.append("# TYPE kinesics_dropped_frames_total counter")
+            for source, total in self.dropped.items():
+                out.append(f'kinesics_dropped_frames_total{{{mode},source="{source}"}} {total}')
+        return "\n".join(out) + "\n"
+
+
+def _cumulative(counts):
+    total = 0
+    for count in counts:
+        total += count
+        yield total
+
+
+# Serves the metrics as Prometheus text on http://127.0.0.1:<port>/metrics
+def serve_metrics(metrics, port, host="127.0.0.1"):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != "/metrics":
+                self.send_error(404)
+                return
+            body = metrics.prometheus_text().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass  # Scrapes are not worth a line in the console
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# Appends a snapshot of the metrics to a JSON lines file every interval seconds
+def write_metrics_jsonl(metrics, path, interval=10.0):
+    def run():
+        while True:
+            time.sleep(interval)
+            with open(path, "a") as f:
+                f.write(json.dumps(metrics.snapshot()) + "\n")
+
+    threading.Thread(target=run, daemon=True).start()
+
+
+def add_metrics_arguments(parser):
+    parser.add_argument("--metrics-port", type=int, default=0, help="Serve Prometheus metrics on this local port (0 = off)")
+    parser.add_argument("--metrics-jsonl", help="Append a metrics snapshot to this file periodically")
+    parser.add_argument("--metrics-interval", type=float, default=10.0, help="Seconds between JSON lines snapshots")
+    parser.add_argument("--overlay", action="store_true", help="Show the metrics over the camera view")
+
+
+# Metrics for a mode, with the exporters asked for on the command line already running
+def create_metrics(mode, args):
+    metrics = Metrics(mode)
+    if args.metrics_port:
+        serve_metrics(metrics, args.metrics_port)
+        print(f"Metrics on http://127.0.0.1:{args.metrics_port}/metrics")
+    if args.metrics_jsonl:
+        write_metrics_jsonl(metrics, args.metrics_jsonl, args.metrics_interval)
+    return metrics
+
+
+# Draw the overlay lines in the top-right corner of a BGR image
+def draw_overlay(image, metrics):
+    x = image.shape[1] - 330
+    for i, line in enumerate(metrics.overlay_lines()):
+        cv2.putText(image, line, (x, 20 + 18 * i), cv2.FONT_HERSHEY_SIMPLEX, 0.45, (255, 255, 0), 1, cv2.LINE_AA)
@@ -0,0 +1,204 @@
+import os
+import sys
+import time
+import threading
+import cv2
+import numpy as np
+
+program_dir = os.path.dirname(os.path.abspath(__file__))
+for mode_dir in ("classic", "driving", "advanced"):
+    sys.path.append(os.path.join(program_dir, mode_dir))
+
+from actuation import ActuationWorker
+from capture import LatestFrameCapture
+from framesource import open_source, is_live_source
+from handtracker import HandTracker
+from scheduler import IdleScheduler
+from classic_mode import ClassicInterpreter
+from driving_mode import DrivingInterpreter, keyinput
+from advanced_interpreter import AdvancedInterpreter, default_sequence_model, open_sequence_model, parse_action_keys
+from gesture_library import open_library
+
+# The interpreter of every mode; the host only reads their hand model settings before one is created
+interpreters = {
+    "classic": ClassicInterpreter,
+    "driving": DrivingInterpreter,
+    "advanced": AdvancedInterpreter,
+}
+
+
+# Keeps the camera open and every hand model loaded in one process, and runs the active mode on a
+# worker thread. Switching modes only replaces the interpreter that turns landmarks into actions,
+# so it takes a frame instead of a new process, a model load and reopening the camera.
+class ModeHost:
+    def __init__(self, source="0", idle_fps=3.0, sequence_model=default_sequence_model, action_keys=None):
+        self.source = source
+        self.sequence_model = open_sequence_model(sequence_model)  # Advanced mode actions, None without a trained model
+        self.action_keys = action_keys or {}
+        self.actuator = ActuationWorker().start()
+        self.mode = None
+        self.interpreter = None
+        self.last_switch_ms = None  # From switch() to the first frame shown by the new mode
+        self.error = None  # Why the last requested mode could not start, until take_error()
+        self.key_error = None  # Why driving keys cannot be sent, None while they can
+        self._key_state = None
+        self._requested = None
+        self._output = None
+        self._output_mode = None
+        self._output_number = 0
+        self._lock = threading.Lock()
+        self._running = False
+        self._thread = None
+        self.cap = None
+
+        # One detector per hand model configuration, created and run once now so no switch pays for it
+        self.detectors = {}
+        for interpreter in interpreters.values():
+            key = self._detector_key(interpreter)
+            if key not in self.detectors:
+                hands = interpreter.create_hands(interpreter.max_hands)
+                search_hands = interpreter.create_hands(interpreter.max_hands, static_image_mode=True)
+                for warm in (hands, search_hands):
+                    warm.process(np.zeros((240, 320, 3), dtype=np.uint8))
+                tracker = HandTracker(hands, track_hands=interpreter.track_hands, max_hands=interpreter.max_hands,
+                                      search_hands=search_hands)
+                self.detectors[key] = IdleScheduler(tracker, idle_after=interpreter.idle_after, idle_fps=idle_fps)
+
+    # Driving keys go through one KeyState while the host runs. It is created when the host starts rather
+    # than when driving mode does, so a missing backend (no /dev/uinput access, no XTest) shows up before
+    # the mode is picked, instead of ending the worker thread.
+    def _open_key_state(self):
+        try:
+            self._key_state = keyinput.KeyState(keyinput.create_backend())
+            self.key_error = None
+        except OSError as e:
+            self._key_state = None
+            self.key_error = str(e)
+
+    # Why the last requested mode could not start, once; None if it started
+    def take_error(self):
+        with self._lock:
+            error, self.error = self.error, None
+        return error
+
+    # Open the camera and start the worker thread
+    def start(self):
+        if self._key_state is None:
+            self._open_key_state()
+        self.live = is_live_source(self.source)
+        self.cap = open_source(self.source)
+        if self.live:
+            self.cap = LatestFrameCapture(self.cap).start()
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    # Stop the worker, end the running mode and release the camera, e.g. while another program needs it
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        # The worker may have quit before it saw the last switch; end the mode here so driving lets go of its keys
+        if self._requested is not None:
+            self._apply_switch()
+        if self.interpreter is not None:
+            self.interpreter.close()
+            self.interpreter = None
+            self.mode = None
+        if self._key_state is not None:
+            self._key_state.close()
+            self._key_state = None
+        if self.cap is not None:
+            self.cap.release()
+            self.cap = None
+
+    # Ask the worker to run another mode (None stops interpreting); returns immediately
+    def switch(self, mode):
+        with self._lock:
+            self._requested = (mode, time.perf_counter())
+
+    # The newest annotated frame as (frame number, mode that drew it, image); the number changes with every
+    # new frame. A switch only takes effect on the worker, so the mode may still be the one switched away from.
+    def latest(self):
+        with self._lock:
+            return self._output_number, self._output_mode, self._output
+
+    def _apply_switch(self):
+        with self._lock:
+            requested, self._requested = self._requested, None
+        mode, requested_at = requested
+        if self.interpreter is not None:
+            self.interpreter.close()
+        self.mode = mode
+        self.interpreter = None
+        if mode is not None:
+            try:
+                self.interpreter = self._create_interpreter(mode)
+            except (OSError, ValueError) as e:
+                with self._lock:
+                    self.error = f"{mode.capitalize()} mode could not start: {e}"
+                self.mode = None
+        if self.interpreter is not None:
+            self._detector().detector.reset()
+        return requested_at
+
+    # Classic and advanced press through the host's actuator, driving holds keys through its KeyState.
+    # Advanced mode reads the library again, since the gesture editor may have changed it.
+    def _create_interpreter(self, mode):
+        if mode == "classic":
+            return ClassicInterpreter(actuator=self.actuator)
+        if mode == "driving":
+            if self._key_state is None:
+                raise OSError(self.key_error)
+            return DrivingInterpreter(self._key_state)
+        return AdvancedInterpreter(open_library(), actuator=self.actuator, sequence_model=self.sequence_model,
+                                   action_keys=self.action_keys)
+
+    @staticmethod
+    def _detector_key(interpreter):
+        return interpreter.create_hands, interpreter.max_hands, interpreter.track_hands, interpreter.idle_after
+
+    def _detector(self):
+        return self.detectors[self._detector_key(self.interpreter)]
+
+    def _run(self):
+        switched_at = None
+        while self._running:
+            if self._requested is not None:
+                switched_at = self._apply_switch()
+            if self.interpreter is None:
+                time.sleep(0.05)  # Nothing to interpret, leave the frames alone
+                continue
+
+            ret, frame = self.cap.read()
+            if not ret:
+                if self.live:
+                    continue
+                break  # End of the recording
+
+            frame_time = self.cap.frame_time if self.live else time.perf_counter()
+            interpreter = self.interpreter
+            if interpreter.mirror:
+                frame = cv2.flip(frame, 1)
+            results = self._detector().process(frame)
+            h, w = frame.shape[:2]
+            interpreter.actuate(interpreter.update(results, w, h, frame_time), frame_time)
+            image = interpreter.draw(frame).copy()
+
+            with self._lock:
+                self._output = image
+                self._output_mode = self.mode
+                self._output_number += 1
+            if switched_at is not None:
+                self.last_switch_ms = (time.perf_counter() - switched_at) * 1000
+                print(f"Switched to {self.mode} mode in {self.last_switch_ms:.0f} ms")
+                switched_at = None
+
+    def close(self):
+        self.stop()
+        if self.interpreter is not None:
+            self.interpreter.close()
+            self.interpreter = None
+        self.actuator.stop()
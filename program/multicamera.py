@@ -0,0 +1,276 @@
+import os
+import sys
+import json
+import time
+import heapq
+import queue
+import argparse
+import multiprocessing
+from collections import namedtuple
+import cv2
+
+program_dir = os.path.dirname(os.path.abspath(__file__))
+for mode_dir in ("classic", "advanced"):
+    sys.path.append(os.path.join(program_dir, mode_dir))
+
+from actuation import ActuationWorker
+from capture import LatestFrameCapture
+from framesource import open_source, is_live_source
+from handtracker import HandTracker
+from scheduler import IdleScheduler
+from metrics import Metrics, Histogram
+
+# One recognized gesture. time is the wall clock time the frame was captured, so events of
+# different cameras (and processes) can be put in one order; action is (name, arguments).
+GestureEvent = namedtuple("GestureEvent", "time camera track handedness gesture action")
+
+
+modes = ("classic", "advanced")
+
+# Actions sent on every frame a gesture is held, as classic_mode.py does; a click or key press is only
+# sent when a hand starts its gesture
+continuous_actions = ("moveTo",)
+
+
+# The interpreter of the mode, deciding actions without carrying them out; the merged stream does that
+def create_interpreter(mode, max_hands, library=None):
+    if mode == "classic":
+        from classic_mode import ClassicInterpreter
+        return ClassicInterpreter(max_hands)
+    from advanced_interpreter import AdvancedInterpreter
+    return AdvancedInterpreter(library, max_hands=max_hands)
+
+
+# Capture, hand detection and gesture recognition of one camera, in its own process. Sends
+# ("event", GestureEvent), ("tick", camera, time) so the merger knows how far this camera has got,
+# ("stats", camera, snapshot) every stats_interval seconds and ("done", camera, snapshot) at the end,
+# also when the worker fails.
+def camera_worker(camera, source, mode, interpreter_args, messages, stop, idle_fps=3.0, stats_interval=1.0, tick_interval=0.02):
+    cv2.setNumThreads(1)  # One core per camera; OpenCV's own threads would compete with the other workers
+    metrics = Metrics(f"camera {camera}")
+    timer = metrics.timer()
+    cap = None
+    try:
+        interpreter = create_interpreter(mode, *interpreter_args)
+        tracker = HandTracker(interpreter.create_hands(interpreter.max_hands), track_hands=interpreter.track_hands,
+                              max_hands=interpreter.max_hands,
+                              search_hands=interpreter.create_hands(interpreter.max_hands, static_image_mode=True))
+        detector = IdleScheduler(tracker, idle_after=interpreter.idle_after, idle_fps=idle_fps)
+        live = is_live_source(source)
+        cap = open_source(source)
+        if live:
+            cap = LatestFrameCapture(cap).start()
+
+        next_stats = time.perf_counter() + stats_interval
+        next_tick = 0.0
+        while not stop.is_set():
+            timer.start()
+            ret, frame = cap.read()
+            if not ret:
+                if live and cap.isOpened():
+                    continue
+                break  # End of the recording
+            frame_time = cap.frame_time if live else time.perf_counter()
+            capture_time = time.time() - (time.perf_counter() - frame_time)  # Wall clock, comparable across processes
+            timer.lap("capture")
+            metrics.frame()
+            if live:
+                metrics.set_dropped("camera", cap.frames_dropped)
+            if interpreter.mirror:
+                frame = cv2.flip(frame, 1)
+
+            results = detector.process(frame)
+            timer.lap("inference")
+
+            h, w = frame.shape[:2]
+            for action in interpreter.update(results, w, h, frame_time):
+                if action.repeat and action.name not in continuous_actions:
+                    continue
+                messages.put(("event", GestureEvent(capture_time, camera, action.hand.track_id, action.hand.handedness,
+                                                    action.gesture, (action.name, action.args))))
+                metrics.actuated(frame_time)  # Camera-to-event latency
+            timer.lap("classify")
+
+            now = time.perf_counter()
+            if now >= next_tick:
+                messages.put(("tick", camera, capture_time))
+                next_tick = now + tick_interval
+            if now >= next_stats:
+                messages.put(("stats", camera, metrics.snapshot()))
+                next_stats = now + stats_interval
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if cap is not None:
+            cap.release()
+        messages.put(("done", camera, metrics.snapshot()))
+
+
+# Puts the events of all cameras into one stream ordered by capture time. An event is held until
+# every running camera has reported a frame at least as new (so nothing older can still arrive),
+# or until it is max_delay seconds old, so a stalled camera delays the stream by at most that.
+class EventMerger:
+    def __init__(self, cameras, max_delay=0.2):
+        self.max_delay = max_delay
+        self.progress = {camera: 0.0 for camera in cameras}  # Newest capture time seen per running camera
+        self.late = 0  # Events that arrived after newer ones had already been released
+        self._heap = []
+        self._count = 0
+        self._released = 0.0
+
+    def add(self, event):
+        heapq.heappush(self._heap, (event.time, self._count, event))
+        self._count += 1
+        self.advance(event.camera, event.time)
+
+    def advance(self, camera, capture_time):
+        if camera in self.progress:
+            self.progress[camera] = max(self.progress[camera], capture_time)
+
+    def finish(self, camera):
+        self.progress.pop(camera, None)
+
+    # Events that can be released now, oldest first
+    def ready(self, flush=False):
+        released = []
+        watermark = min(self.progress.values(), default=float("inf"))
+        deadline = time.time() - self.max_delay
+        while self._heap and (flush or self._heap[0][0] <= watermark or self._heap[0][0] <= deadline):
+            event = heapq.heappop(self._heap)[2]
+            if event.time < self._released:
+                self.late += 1
+            self._released = max(self._released, event.time)
+            released.append(event)
+        return released
+
+
+def camera_line(camera, source, snapshot):
+    stages = snapshot["stages"]
+    inference = stages.get("inference", {"mean_ms": 0.0, "p95_ms": 0.0})
+    latency = snapshot["actuation"]
+    dropped = sum(snapshot["dropped"].values())
+    return (f"camera {camera} ({source}): {snapshot['fps']:.1f} FPS, {snapshot['frames']} frames, "
+            f"inference {inference['mean_ms']:.1f} ms mean / {inference['p95_ms']:.1f} ms p95, "
+            f"camera to event {latency['mean_ms']:.0f} ms mean / {latency['p95_ms']:.0f} ms p95 "
+            f"({latency['count']} events), dropped {dropped}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recognize gestures on several cameras at once, one process per camera")
+    parser.add_argument("--sources", default="0,1", help="Comma separated webcam indexes, video files or image directories")
+    parser.add_argument("--mode", choices=list(modes), default="classic")
+    parser.add_argument("--max-hands", type=int, default=2, help="Hands followed per camera")
+    parser.add_argument("--events", help="Append the merged events to this JSON lines file instead of printing them")
+    parser.add_argument("--actuate", action="store_true", help="Carry out the action of every event with pyautogui")
+    parser.add_argument("--max-delay", type=float, default=0.2, help="Longest an event waits for the other cameras, in seconds")
+    parser.add_argument("--idle-fps", type=float, default=3.0, help="Detection rate while no hand is in view")
+    parser.add_argument("--stats-interval", type=float, default=5.0, help="Seconds between per-camera reports")
+    args = parser.parse_args()
+
+    sources = args.sources.split(",")
+    interpreter_args = (args.max_hands,)
+    if args.mode == "advanced":
+        # Read (and if needed migrate) the library once here instead of in every worker
+        from gesture_library import open_library
+        interpreter_args = (args.max_hands, open_library())
+
+    # Spawned, not forked: every worker loads its own MediaPipe graph and opens its own camera
+    context = multiprocessing.get_context("spawn")
+    messages = context.Queue()
+    stop = context.Event()
+    workers = [context.Process(target=camera_worker, args=(camera, source, args.mode, interpreter_args, messages, stop),
+                               kwargs={"idle_fps": args.idle_fps}, daemon=True)
+               for camera, source in enumerate(sources)]
+    for worker in workers:
+        worker.start()
+    print(f"Running {args.mode} mode on {len(workers)} cameras in {len(workers)} processes")
+
+    merger = EventMerger(range(len(workers)), max_delay=args.max_delay)
+    actuator = ActuationWorker().start() if args.actuate else None
+    events_file = open(args.events, "a") if args.events else None
+    delay = Histogram()  # From capture until the event left the merger
+    snapshots = {}
+    running = set(range(len(workers)))
+    started = time.perf_counter()
+    next_report = started + args.stats_interval
+
+    def emit(events):
+        for event in events:
+            delay.observe(time.time() - event.time)
+            line = json.dumps(event._asdict())
+            if events_file is not None:
+                events_file.write(line + "\n")
+            else:
+                print(line)
+            if actuator is not None:
+                name, action_args = event.action
+                actuator.submit(name, *action_args)
+
+    # Cameras whose worker has exited; only called when the queue is empty, so a worker that said
+    # "done" has been heard. One that died without it (killed, or lost before its finally) still ends.
+    def reap():
+        for camera in list(running):
+            if not workers[camera].is_alive():
+                print(f"camera {camera} ({sources[camera]}) stopped with exit code {workers[camera].exitcode}")
+                merger.finish(camera)
+                running.discard(camera)
+
+    try:
+        while running:
+            try:
+                message = messages.get(timeout=0.05)
+            except queue.Empty:
+                message = None
+                reap()
+            if message is not None:
+                kind, payload = message[0], message[1:]
+                if kind == "event":
+                    merger.add(payload[0])
+                elif kind == "tick":
+                    merger.advance(*payload)
+                elif kind == "stats":
+                    snapshots[payload[0]] = payload[1]
+                elif kind == "done":
+                    snapshots[payload[0]] = payload[1]
+                    merger.finish(payload[0])
+                    running.discard(payload[0])
+            emit(merger.ready())
+
+            if time.perf_counter() >= next_report:
+                next_report += args.stats_interval
+                for camera in sorted(snapshots):
+                    print(camera_line(camera, sources[camera], snapshots[camera]))
+    except KeyboardInterrupt:
+        stop.set()
+        deadline = time.perf_counter() + 2.0
+        while running and time.perf_counter() < deadline:  # Let every worker send its final numbers
+            try:
+                kind, *payload = messages.get(timeout=0.1)
+            except queue.Empty:
+                reap()
+                continue
+            if kind == "event":
+                merger.add(payload[0])
+            elif kind == "done":
+                snapshots[payload[0]] = payload[1]
+                running.discard(payload[0])
+    emit(merger.ready(flush=True))
+
+    for worker in workers:
+        worker.join(timeout=2.0)
+    elapsed = time.perf_counter() - started
+    frames = sum(snapshot["frames"] for snapshot in snapshots.values())
+    for camera in sorted(snapshots):
+        print(camera_line(camera, sources[camera], snapshots[camera]))
+    summary = delay.summary()
+    print(f"{frames} frames from {len(sources)} cameras in {elapsed:.1f} s ({frames / elapsed:.1f} FPS in total), "
+          f"{summary['count']} events, capture to merged event {summary['mean_ms']:.0f} ms mean / {summary['p95_ms']:.0f} ms p95, "
+          f"{merger.late} out of order")
+    if actuator is not None:
+        actuator.stop()
+    if events_file is not None:
+        events_file.close()
+
+
+if __name__ == "__main__":
+    main()
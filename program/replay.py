@@ -0,0 +1,123 @@
+import os
+import sys
+import time
+import argparse
+
+program_dir = os.path.dirname(os.path.abspath(__file__))
+for mode_dir in ("classic", "driving", "advanced"):
+    sys.path.append(os.path.join(program_dir, mode_dir))
+
+from landmarktrace import Trace, TraceAction
+
+# Recorded actions each mode's interpreter reproduces; motion gestures and actions are not replayed, since
+# the trace does not name the motion templates and action model they were matched against
+sources = {
+    "classic": ("gesture",),
+    "driving": ("steering",),
+    "advanced": ("gesture",),
+}
+
+
+# The interpreter the trace's mode ran with, deciding actions without carrying them out. Returns it with
+# the frame from which the recorded actions can no longer be reproduced (None for the whole trace) and
+# a reason the replay may not be a fair check (None if it is).
+# Advanced traces name their templates by their digest, and a library with other templates is refused;
+# when gestures were registered or reset during the session, only the actions before that are checked.
+def create_interpreter(trace, args):
+    if trace.mode == "classic":
+        from classic_mode import ClassicInterpreter
+        return ClassicInterpreter(), None, None
+    if trace.mode == "driving":
+        from driving_mode import DrivingInterpreter, keyinput
+        return DrivingInterpreter(keyinput.KeyState(keyinput.RecordingBackend()), **trace.options), None, None
+
+    from advanced_interpreter import AdvancedInterpreter
+    from gesture_library import GestureLibrary
+    library = GestureLibrary.load(args.gestures)
+    options = dict(trace.options)
+    recorded = options.pop("library", None)
+    digest = library.feature_digest()
+    warning = None
+    if recorded is None:
+        warning = f"the trace does not name its gesture library, {args.gestures} was used unchecked"
+    elif recorded != digest:
+        raise ValueError(f"recorded with gesture library {recorded}, but {args.gestures} is {digest}; "
+                         f"pass the library of that session with --gestures")
+    changes = [action.frame for action in trace.actions if action.source == "library"]
+    return AdvancedInterpreter(library, **options), changes[0] if changes else None, warning
+
+
+# Feed every frame of the trace to the interpreter as fast as it goes; returns the actions and the seconds it took
+def replay(trace, interpreter):
+    times = trace.frames["time"].tolist()
+    w, h = trace.width, trace.height
+    replayed = sources[trace.mode]
+    actions = []
+    started = time.perf_counter()
+    for i, frame_time in enumerate(times):
+        for action in interpreter.actuate(interpreter.update(trace.results(i), w, h, frame_time), frame_time):
+            if action.source in replayed:
+                actions.append(TraceAction(i, action.source, action.name, tuple(action.args)))
+    return actions, time.perf_counter() - started
+
+
+# Index of the first action that differs, or None when both sequences are the same
+def first_difference(recorded, replayed):
+    for i, (a, b) in enumerate(zip(recorded, replayed)):
+        if a != b:
+            return i
+    if len(recorded) != len(replayed):
+        return min(len(recorded), len(replayed))
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded landmark traces through the mode interpreters without MediaPipe "
+                                                 "and check that they emit the recorded actions")
+    parser.add_argument("traces", nargs="+", help="Trace files written with --record")
+    parser.add_argument("--gestures", default="gestures.npz", help="Gesture library for advanced mode traces")
+    parser.add_argument("--repeat", type=int, default=1, help="Replay each trace this many times and report the fastest")
+    args = parser.parse_args()
+
+    failed = 0
+    for path in args.traces:
+        try:
+            trace = Trace(path)
+            best = None
+            for _ in range(max(args.repeat, 1)):
+                interpreter, until, warning = create_interpreter(trace, args)  # Fresh state for every run
+                replayed, seconds = replay(trace, interpreter)
+                best = seconds if best is None else min(best, seconds)
+        except ValueError as e:
+            print(f"{path}: {e}")
+            failed += 1
+            continue
+        recorded = [action for action in trace.actions if action.source in sources[trace.mode]]
+        skipped = sum(action.source not in sources[trace.mode] and action.source != "library" for action in trace.actions)
+
+        rate = len(trace) / best if best > 0 else float("inf")
+        print(f"{path}: {trace.mode} mode, {len(trace)} frames replayed in {best * 1000:.1f} ms ({rate:.0f} frames/s), "
+              f"{len(replayed)} actions" + (f", {skipped} recorded actions of other sources not replayed" if skipped else ""))
+        if warning is not None:
+            print(f"  warning: {warning}")
+        if until is not None:
+            # The session changed its templates at that frame; later actions came from templates that are gone
+            recorded = [action for action in recorded if action.frame < until]
+            replayed = [action for action in replayed if action.frame < until]
+            print(f"  the gesture library changed at frame {until}, only the {len(recorded)} actions before it are checked")
+        difference = first_difference(recorded, replayed)
+        if difference is None:
+            print(f"  matches the {len(recorded)} recorded actions")
+            continue
+        failed += 1
+        expected = recorded[difference] if difference < len(recorded) else "nothing"
+        got = replayed[difference] if difference < len(replayed) else "nothing"
+        print(f"  differs at action {difference}: recorded {expected}, replayed {got}")
+
+    if failed:
+        print(f"{failed} of {len(args.traces)} traces did not match")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
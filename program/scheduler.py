@@ -0,0 +1,62 @@
+import time
+from collections import deque, namedtuple
+
+# What process() returns for a frame that was not looked at; reads like a frame without hands
+NoHands = namedtuple("NoHands", "multi_hand_landmarks multi_handedness")
+no_hands = NoHands(None, None)
+
+
+# Runs hand detection on every frame while someone is in front of the camera, and only a few
+# times per second once no hand has been seen for idle_after frames in a row. The first frame
+# with a hand switches back to the full rate.
+class IdleScheduler:
+    def __init__(self, detector, idle_after=30, idle_fps=3.0, window=100):
+        self.detector = detector  # Anything with process(frame), e.g. a HandTracker
+        self.idle_after = idle_after  # Frames without a hand before going idle, 0 never goes idle
+        self.idle_interval = 1.0 / idle_fps if idle_fps > 0 else 0.0
+        self.state = "active"
+        self.misses = 0  # Detections in a row that found no hand
+        self.wakeups = 0
+        self.skipped = 0
+        self._history = deque(maxlen=window)  # Whether detection ran, for the last frames
+        self._ran = 0
+        self._last_run = 0.0
+
+    def process(self, frame):
+        now = time.perf_counter()
+        run = self.state == "active" or now - self._last_run >= self.idle_interval
+        if len(self._history) == self._history.maxlen:
+            self._ran -= self._history[0]
+        self._history.append(run)
+        self._ran += run
+        if not run:
+            self.skipped += 1
+            return no_hands
+
+        self._last_run = now
+        results = self.detector.process(frame)
+        if results.multi_hand_landmarks:
+            if self.state == "idle":
+                self.state = "active"
+                self.wakeups += 1
+            self.misses = 0
+        else:
+            self.misses += 1
+            if self.idle_after and self.misses >= self.idle_after:
+                self.state = "idle"
+        return results
+
+    # Fraction of the recent frames on which detection ran
+    def duty_cycle(self):
+        return self._ran / len(self._history) if self._history else 1.0
+
+    def status(self):
+        return f"{self.state}, detecting {self.duty_cycle():.0%} of frames"
+
+    def stats(self):
+        return {
+            "state": self.state,
+            "duty_cycle": self.duty_cycle(),
+            "skipped": self.skipped,
+            "wakeups": self.wakeups,
+        }
@@ -0,0 +1,284 @@
+import time
+import argparse
+from collections import namedtuple
+from multiprocessing import shared_memory, resource_tracker
+import numpy as np
+import mediapipe as mp
+from mediapipe.framework.formats import landmark_pb2, classification_pb2
+
+from capture import LatestFrameCapture
+from framesource import open_source, is_live_source
+from handtracker import HandTracker
+from scheduler import IdleScheduler
+
+default_name = "kinesics_landmarks"
+handedness_labels = ("Left", "Right", "Unknown")
+unknown_label = handedness_labels.index("Unknown")  # Written when MediaPipe gave no handedness
+
+# Start of the shared memory block; the ring of slots follows at header_size
+header_dtype = np.dtype([
+    ("closed", "<i4"),  # Set when the daemon stops
+    ("slots", "<i4"),
+    ("height", "<i4"),
+    ("width", "<i4"),
+    ("max_hands", "<i4"),
+    ("seq", "<i8"),  # Sequence number of the newest complete slot, 0 before the first frame
+], align=True)
+header_size = 64
+
+
+# One published frame: the camera image and the landmarks found on it, in normalized coordinates
+def slot_dtype(height, width, max_hands):
+    return np.dtype([
+        ("seq", "<i8"),  # -1 while the daemon is writing the slot
+        ("time", "<f8"),  # time.time() when the frame was captured
+        ("hands", "<i4"),
+        ("labels", "i1", (max_hands,)),  # Index into handedness_labels
+        ("scores", "<f4", (max_hands,)),
+        ("points", "<f4", (max_hands, 21, 3)),
+        ("frame", "u1", (height, width, 3)),
+    ], align=True)
+
+
+# Results built from a slot; reads like the results of hands.process()
+SharedResults = namedtuple("SharedResults", "multi_hand_landmarks multi_handedness")
+
+
+# Attach to an existing block without taking ownership of it
+def attach_block(name):
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Before Python 3.13 an attached block is tracked and would be unlinked when this process exits
+        shm = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
+
+
+# Remove a block left behind by a daemon that crashed. A block whose daemon is still publishing
+# (its sequence number moves within wait seconds) is left alone and FileExistsError is raised.
+def remove_stale_block(name, wait=0.5):
+    shm = attach_block(name)
+    running = False
+    if shm.size >= header_size:
+        header = np.ndarray((), header_dtype, buffer=shm.buf)
+        if not header["closed"]:
+            seq = int(header["seq"])
+            time.sleep(wait)
+            running = int(header["seq"]) != seq
+        del header
+    shm.close()
+    if running:
+        raise FileExistsError(f"Another daemon is sharing landmarks as '{name}'")
+    try:
+        shm = shared_memory.SharedMemory(name=name)  # Tracked, so unlink() also unregisters it
+    except FileNotFoundError:
+        return  # The crashed daemon's resource tracker removed it meanwhile
+    shm.unlink()
+    shm.close()
+    print(f"Removed the shared memory block '{name}' left behind by an earlier daemon")
+
+
+# Writes frames and landmarks into a ring of shared memory slots. Every slot carries the sequence
+# number of its frame, which is cleared while it is being written, so readers can tell a complete
+# slot from one that was overwritten under them.
+class LandmarkPublisher:
+    def __init__(self, shape, name=default_name, slots=4, max_hands=2):
+        height, width = shape[:2]
+        self.dtype = slot_dtype(height, width, max_hands)
+        self.max_hands = max_hands
+        size = header_size + slots * self.dtype.itemsize
+        try:
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            remove_stale_block(name)
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        self.header = np.ndarray((), header_dtype, buffer=self.shm.buf)
+        self.slots = np.ndarray((slots,), self.dtype, buffer=self.shm.buf, offset=header_size)
+        self.slots["seq"] = 0
+        self.header["closed"] = 0
+        self.header["slots"] = slots
+        self.header["height"] = height
+        self.header["width"] = width
+        self.header["max_hands"] = max_hands
+        self.header["seq"] = 0
+        self.seq = 0
+
+    def publish(self, frame, results, capture_time):
+        self.seq += 1
+        slot = self.slots[self.seq % len(self.slots)]
+        slot["seq"] = -1
+        slot["time"] = capture_time
+        hands = results.multi_hand_landmarks or []
+        count = min(len(hands), self.max_hands)
+        slot["hands"] = count
+        handedness = results.multi_handedness or []
+        for i in range(count):
+            slot["points"][i] = [(lm.x, lm.y, lm.z) for lm in hands[i].landmark]
+            label, score = unknown_label, 0.0
+            if i < len(handedness):
+                classification = handedness[i].classification[0]
+                if classification.label in handedness_labels:
+                    label, score = handedness_labels.index(classification.label), classification.score
+            slot["labels"][i] = label
+            slot["scores"][i] = score
+        slot["frame"] = frame
+        slot["seq"] = self.seq
+        self.header["seq"] = self.seq
+
+    def close(self):
+        self.header["closed"] = 1
+        del self.header, self.slots
+        self.shm.close()
+        self.shm.unlink()
+
+
+# Attaches to a running daemon. It reads like a capture device (read() returns the newest frame) and
+# like a hand detector (process() returns the landmarks of that frame), so a mode can use it in place
+# of both. Frames are read-only views into shared memory that stay valid until the daemon comes round
+# to their slot again (is_current() tells); copy_frames is for callers that keep a frame or draw into it.
+class LandmarkReader:
+    def __init__(self, name=default_name, mirror=False, copy_frames=False, timeout=1.0):
+        self.shm = attach_block(name)
+        self.name = name
+        self.header = np.ndarray((), header_dtype, buffer=self.shm.buf)
+        dtype = slot_dtype(int(self.header["height"]), int(self.header["width"]), int(self.header["max_hands"]))
+        self.slots = np.ndarray((int(self.header["slots"]),), dtype, buffer=self.shm.buf, offset=header_size)
+        self.slots.flags.writeable = False  # Only the daemon writes the slots
+        self.mirror = mirror  # Landmarks for the mirrored frame
+        self.copy_frames = copy_frames
+        self.timeout = timeout  # Seconds without a new frame after which the daemon counts as gone
+        self._header_seq = int(self.header["seq"])  # Newest sequence number seen in the header, and when
+        self._header_seen = time.perf_counter()
+        self.seq = 0  # Sequence number of the last frame read
+        self.time = 0.0  # Capture time of the last frame read
+        self.points = np.zeros((0, 21, 3), dtype=np.float32)
+        self.labels = np.zeros(0, dtype=np.int8)
+        self.scores = np.zeros(0, dtype=np.float32)
+        self.frames_read = 0
+        self.frames_dropped = 0
+
+    # False once the daemon closed the block, or published nothing for timeout seconds, e.g. because it
+    # was killed before it could close it
+    def isOpened(self):
+        if self.shm is None or self.header["closed"]:
+            return False
+        seq = int(self.header["seq"])
+        now = time.perf_counter()
+        if seq != self._header_seq:
+            self._header_seq, self._header_seen = seq, now
+        return now - self._header_seen <= self.timeout
+
+    # Wait for a frame newer than the last one read
+    def read(self):
+        deadline = time.perf_counter() + self.timeout
+        while self.isOpened():
+            seq = int(self.header["seq"])
+            if seq > self.seq:
+                slot = self.slots[seq % len(self.slots)]
+                if slot["seq"] == seq:
+                    hands = int(slot["hands"])
+                    points = slot["points"][:hands].copy()
+                    labels = slot["labels"][:hands].copy()
+                    scores = slot["scores"][:hands].copy()
+                    capture_time = float(slot["time"])
+                    frame = slot["frame"].copy() if self.copy_frames else slot["frame"]
+                    if slot["seq"] == seq:  # Not overwritten while copying
+                        if self.seq:
+                            self.frames_dropped += seq - self.seq - 1
+                        self.seq, self.time = seq, capture_time
+                        self.points, self.labels, self.scores = points, labels, scores
+                        self.frames_read += 1
+                        return True, frame
+                continue  # The daemon was writing that slot, look again
+            if time.perf_counter() > deadline:
+                break
+            time.sleep(0.001)
+        return False, None
+
+    # False once the daemon has started overwriting the slot of the last frame read
+    def is_current(self):
+        return self.isOpened() and self.slots[self.seq % len(self.slots)]["seq"] == self.seq
+
+    # Capture time of the last frame read on the time.perf_counter() clock of this process
+    @property
+    def frame_time(self):
+        return time.perf_counter() - (time.time() - self.time)
+
+    def status(self):
+        return f"shared by '{self.name}', {time.time() - self.time:.3f} s old, {self.frames_dropped} frames dropped"
+
+    # Landmarks of the last frame read, as MediaPipe results
+    def process(self, frame=None):
+        if not len(self.points):
+            return SharedResults(None, None)
+        points = self.points
+        if self.mirror:
+            points = points.copy()
+            points[..., 0] = 1 - points[..., 0]
+        hand_landmarks = []
+        handedness = []
+        for i, hand in enumerate(points.tolist()):
+            hand_landmarks.append(landmark_pb2.NormalizedLandmarkList(
+                landmark=[landmark_pb2.NormalizedLandmark(x=x, y=y, z=z) for x, y, z in hand]))
+            label = int(self.labels[i])
+            if self.mirror and label != unknown_label:
+                label = 1 - label  # Left and Right swap
+            handedness.append(classification_pb2.ClassificationList(classification=[
+                classification_pb2.Classification(index=label, label=handedness_labels[label], score=float(self.scores[i]))]))
+        return SharedResults(hand_landmarks, handedness)
+
+    def release(self):
+        if self.shm is not None:
+            del self.header, self.slots
+            self.shm.close()
+            self.shm = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run hand tracking once and share frames and landmarks with the modes")
+    parser.add_argument("--source", default="0", help="Webcam index, video file or image directory")
+    parser.add_argument("--name", default=default_name, help="Name of the shared memory block")
+    parser.add_argument("--slots", type=int, default=4, help="Frames kept in the ring")
+    parser.add_argument("--max-hands", type=int, default=2)
+    parser.add_argument("--min-detection-confidence", type=float, default=0.5)
+    parser.add_argument("--idle-after", type=int, default=30, help="Frames without a hand before detection slows down (0 = never)")
+    parser.add_argument("--idle-fps", type=float, default=3.0, help="Detection rate while no hand is in view")
+    args = parser.parse_args()
+
+    hands = mp.solutions.hands.Hands(max_num_hands=args.max_hands, min_detection_confidence=args.min_detection_confidence)
+    search_hands = mp.solutions.hands.Hands(static_image_mode=True, max_num_hands=args.max_hands,
+                                            min_detection_confidence=args.min_detection_confidence)
+    scheduler = IdleScheduler(HandTracker(hands, track_hands=args.max_hands, search_hands=search_hands),
+                              idle_after=args.idle_after, idle_fps=args.idle_fps)
+
+    live = is_live_source(args.source)
+    cap = open_source(args.source)
+    if live:
+        cap = LatestFrameCapture(cap).start()
+
+    publisher = None
+    start_time = time.perf_counter()
+    try:
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                if live:
+                    continue
+                break  # End of the recording
+            capture_time = time.time()
+            if publisher is None:
+                publisher = LandmarkPublisher(frame.shape, name=args.name, slots=args.slots, max_hands=args.max_hands)
+                print(f"Publishing {frame.shape[1]}x{frame.shape[0]} frames as '{args.name}'")
+            publisher.publish(frame, scheduler.process(frame), capture_time)
+    except KeyboardInterrupt:
+        pass
+
+    if publisher is not None:
+        print(f"Published {publisher.seq} frames at {publisher.seq / (time.perf_counter() - start_time):.1f} FPS")
+        publisher.close()
+    cap.release()
+
+
+if __name__ == "__main__":
+    main()